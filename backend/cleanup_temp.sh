@@ -1,17 +1,23 @@
 #!/bin/bash
 
 # Cleanup script for video-dub temporary files
+#
+# Only per-session working files live here. Persistent state (sessions DB,
+# voice/clone/synthesis caches) is kept in STATE_DIR (default ~/.video-dub)
+# and is not touched by this script.
+
+TEMP_DIR="${TEMP_DIR_BASE:-/tmp/video-dub}"
 
 echo "Cleaning up video-dub temporary files..."
 
-if [ -d "/tmp/video-dub" ]; then
-    echo "Found temp directory: /tmp/video-dub"
-    ls -la /tmp/video-dub/
+if [ -d "$TEMP_DIR" ]; then
+    echo "Found temp directory: $TEMP_DIR"
+    ls -la "$TEMP_DIR"/
     echo ""
     read -p "Delete all temp files? (y/N): " confirm
     
     if [[ $confirm == [yY] ]]; then
-        rm -rf /tmp/video-dub
+        rm -rf "$TEMP_DIR"
         echo "✅ All temp files deleted"
     else
         echo "ℹ️  Temp files preserved"
@@ -1,54 +1,111 @@
 """Configuration management for Video Dubbing Studio"""
 
 import os
+from dataclasses import dataclass, field
+from typing import Optional
+
 from dotenv import load_dotenv
-from pathlib import Path
 
 # Load environment variables from .env file
 load_dotenv()
 
+
+def _env(name: str, default: Optional[str] = None, **field_kwargs):
+    """Dataclass field read from the environment when Config is instantiated"""
+    return field(default_factory=lambda: os.getenv(name, default), **field_kwargs)
+
+
+def _env_int(name: str, default: str):
+    """Integer dataclass field read from the environment"""
+    return field(default_factory=lambda: int(os.getenv(name, default)))
+
+
+def _state_dir() -> str:
+    """Directory for state that must survive temp cleanup (defaults to ~/.video-dub)"""
+    return os.path.expanduser(os.getenv("STATE_DIR") or "~/.video-dub")
+
+
+def _state_path(name: str, file_name: str):
+    """Path dataclass field read from the environment, defaulting to file_name under STATE_DIR"""
+    return field(
+        default_factory=lambda: os.path.expanduser(os.getenv(name) or os.path.join(_state_dir(), file_name))
+    )
+
+
+def _env_bool(name: str, default: str = "false"):
+    """Boolean dataclass field read from the environment ("true" enables it)"""
+    return field(default_factory=lambda: os.getenv(name, default).lower() == "true")
+
+
+@dataclass(frozen=True, slots=True)
 class Config:
-    """Configuration settings loaded from environment variables"""
-    
+    """Configuration settings loaded once from environment variables"""
+
     # API Keys
-    DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
-    ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
-    
+    DEEPGRAM_API_KEY: Optional[str] = _env("DEEPGRAM_API_KEY", repr=False)
+    ELEVENLABS_API_KEY: Optional[str] = _env("ELEVENLABS_API_KEY", repr=False)
+
     # File Storage
-    TEMP_DIR_BASE = os.getenv("TEMP_DIR_BASE", "/tmp/video-dub")
-    CLEANUP_TEMP_FILES = os.getenv("CLEANUP_TEMP_FILES", "false").lower() == "true"
-    
-    # Server Settings  
-    HOST = os.getenv("HOST", "0.0.0.0")
-    PORT = int(os.getenv("PORT", "8000"))
-    DEBUG = os.getenv("DEBUG", "false").lower() == "true"
-    
+    TEMP_DIR_BASE: str = _env("TEMP_DIR_BASE", "/tmp/video-dub")
+    CLEANUP_TEMP_FILES: bool = _env_bool("CLEANUP_TEMP_FILES")
+    # When set (e.g. "/internal/video-dub"), dubbed videos are served by nginx via
+    # X-Accel-Redirect; the prefix must map to an internal location aliasing TEMP_DIR_BASE
+    X_ACCEL_REDIRECT_PREFIX: Optional[str] = _env("X_ACCEL_REDIRECT_PREFIX")
+    # Persistent state lives outside TEMP_DIR_BASE, so clearing temp files (see
+    # cleanup_temp.sh) never wipes sessions or the record of cloned voices
+    STATE_DIR: str = field(default_factory=_state_dir)
+    # SQLite database holding dubbing session state (shared by all workers)
+    SESSION_DB_PATH: str = _state_path("SESSION_DB_PATH", "sessions.db")
+    # Sessions kept in the database; creating more evicts the oldest (and their videos)
+    SESSION_MAX_ROWS: int = _env_int("SESSION_MAX_ROWS", "1000")
+    # Cached ElevenLabs voice options, so restarts don't refetch the catalog
+    VOICE_CACHE_PATH: str = _state_path("VOICE_CACHE_PATH", "voices.json")
+    # Reference audio digest -> cloned voice ID; the only record of which clones exist
+    CLONE_CACHE_PATH: str = _state_path("CLONE_CACHE_PATH", "clone_cache.json")
+    # Synthesized speech keyed by content hash, reused across sessions
+    SYNTH_CACHE_DIR: str = _state_path("SYNTH_CACHE_DIR", "synth_cache")
+    # Cached syntheses unused for this long are deleted
+    SYNTH_CACHE_MAX_AGE_HOURS: int = _env_int("SYNTH_CACHE_MAX_AGE_HOURS", "168")
+
+    # Server Settings
+    HOST: str = _env("HOST", "0.0.0.0")
+    PORT: int = _env_int("PORT", "8000")
+    DEBUG: bool = _env_bool("DEBUG")
+    WORKERS: int = _env_int("WORKERS", str(os.cpu_count() or 1))
+    BACKLOG: int = _env_int("BACKLOG", "2048")
+    # Maximum concurrent connections per worker before 503s (0 = unlimited)
+    LIMIT_CONCURRENCY: int = _env_int("LIMIT_CONCURRENCY", "0")
+
     # API URLs
-    DEEPGRAM_BASE_URL = os.getenv("DEEPGRAM_BASE_URL", "https://api.deepgram.com")
-    ELEVENLABS_BASE_URL = os.getenv("ELEVENLABS_BASE_URL", "https://api.elevenlabs.io/v1")
-    
-    @classmethod
-    def validate(cls):
+    DEEPGRAM_BASE_URL: str = _env("DEEPGRAM_BASE_URL", "https://api.deepgram.com")
+    ELEVENLABS_BASE_URL: str = _env("ELEVENLABS_BASE_URL", "https://api.elevenlabs.io/v1")
+    # Concurrent ElevenLabs synthesis requests per worker process; with several
+    # WORKERS the server total is WORKERS x this, and any overshoot of the plan's
+    # limit is retried on 429
+    ELEVENLABS_MAX_CONCURRENCY: int = _env_int("ELEVENLABS_MAX_CONCURRENCY", "8")
+    # Cloned voices kept for reuse; older clones are deleted from ElevenLabs
+    CLONE_CACHE_MAX_VOICES: int = _env_int("CLONE_CACHE_MAX_VOICES", "20")
+
+    def __post_init__(self):
         """Validate that all required environment variables are set"""
         missing_vars = []
-        
-        if not cls.DEEPGRAM_API_KEY:
+
+        if not self.DEEPGRAM_API_KEY:
             missing_vars.append("DEEPGRAM_API_KEY")
-        if not cls.ELEVENLABS_API_KEY:
+        if not self.ELEVENLABS_API_KEY:
             missing_vars.append("ELEVENLABS_API_KEY")
-            
+
         if missing_vars:
             raise ValueError(
                 f"Missing required environment variables: {', '.join(missing_vars)}\n"
                 f"Please create a .env file based on env.example"
             )
-    
-    @classmethod
-    def get_temp_dir(cls, session_id: str = None) -> str:
+
+    def get_temp_dir(self, session_id: str = None) -> str:
         """Get temporary directory path for a session"""
         if session_id:
-            return os.path.join(cls.TEMP_DIR_BASE, session_id)
-        return cls.TEMP_DIR_BASE
+            return os.path.join(self.TEMP_DIR_BASE, session_id)
+        return self.TEMP_DIR_BASE
 
-# Global config instance
-config = Config() 
+# Global config instance - validated once at import
+config = Config()
@@ -0,0 +1,13 @@
+"""Shared HTTP client for outbound API calls (Deepgram)"""
+
+import httpx
+
+
+# One pooled client for the whole process: TCP/TLS connections to each API host
+# are reused across requests and concurrent calls multiplex over HTTP/2.
+# Per-request timeouts can still override the default below.
+shared_http = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+    timeout=httpx.Timeout(60.0)
+)
@@ -1 +1,36 @@
- 
\ No newline at end of file
+"""
+Logging setup for Video Dubbing Studio
+
+Log records are handed to a background thread through a queue, so logging from
+request handlers and pipeline coroutines never blocks the event loop on
+stdout writes.
+"""
+
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+from config import config
+
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+_log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+
+_stream_handler = logging.StreamHandler()
+_stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+_listener = QueueListener(_log_queue, _stream_handler, respect_handler_level=True)
+_listener.start()
+atexit.register(_listener.stop)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Get a logger whose records are written by the background queue listener"""
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        logger.addHandler(QueueHandler(_log_queue))
+        logger.setLevel(logging.DEBUG if config.DEBUG else logging.INFO)
+        logger.propagate = False
+    return logger
@@ -1,24 +1,48 @@
 import asyncio
 import os
+import re
 import uuid
+from contextlib import asynccontextmanager
 from typing import Dict, Any, List, Optional
 
-from fastapi import FastAPI, HTTPException
+import aiofiles
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
 from pydantic import BaseModel, HttpUrl
 
 from config import config
+from http_client import shared_http
+from logger import get_logger
 from transcribe import process_video_transcription
 from translate import translate_transcription, SUPPORTED_LANGUAGES
-from tts import TTSService, VOICE_PRESETS
+from tts import VoiceNotFoundError, tts_service
 from video_processing import VideoProcessor, dubbing_pipeline
 
 
-# Validate configuration at startup
-config.validate()
+logger = get_logger("dubbing")
 
-app = FastAPI(title="Video Dubbing Studio", version="1.0.0")
+# Chunk size used when streaming byte ranges of dubbed videos
+VIDEO_CHUNK_SIZE = 64 * 1024
+RANGE_HEADER_PATTERN = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Expose the pooled HTTP clients on app.state and close them on shutdown"""
+    app.state.http = tts_service.elevenlabs.client
+    app.state.deepgram_http = shared_http
+    yield
+    await tts_service.aclose()
+    await shared_http.aclose()
+
+
+app = FastAPI(
+    title="Video Dubbing Studio",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse  # Faster JSON encoding for polled/large responses
+)
 
 # Add CORS middleware
 app.add_middleware(
@@ -92,7 +116,6 @@ async def get_supported_languages():
 async def get_voice_options():
     """Get available voice options for dubbing"""
     try:
-        tts_service = TTSService()
         voices = await tts_service.get_voice_options()
         return VoiceOptionsResponse(voices=voices)
     except Exception as e:
@@ -175,13 +198,20 @@ async def dub_video(dub_request: DubRequest):
         raise HTTPException(status_code=500, detail=f"Dubbing initiation failed: {str(e)}")
 
 @app.get("/dub/status/{session_id}", response_model=DubbingResponse)
-async def get_dubbing_status(session_id: str):
+async def get_dubbing_status(session_id: str, request: Request, response: Response):
     """Get status of dubbing process"""
-    session = dubbing_pipeline.get_session(session_id)
+    session = await dubbing_pipeline.get_session(session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    response = DubbingResponse(
+    # Status and progress fully determine the payload, so unchanged polls get a 304
+    etag = f'W/"{session["status"]}-{session["progress"]}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    
+    status_response = DubbingResponse(
         success=True,
         session_id=session_id,
         status=session["status"],
@@ -189,116 +219,219 @@ async def get_dubbing_status(session_id: str):
     )
     
     if session["status"] == "completed":
-        response.video_url = f"/video/{session_id}"
-        response.download_url = f"/download/{session_id}"
+        status_response.video_url = f"/video/{session_id}"
+        status_response.download_url = f"/download/{session_id}"
     elif session["status"] == "failed":
-        response.error = session.get("error", "Unknown error occurred")
+        status_response.error = session.get("error") or "Unknown error occurred"
     
-    return response
+    return status_response
 
 @app.get("/video/{session_id}")
-async def stream_video(session_id: str):
+async def stream_video(session_id: str, request: Request):
     """Stream dubbed video for viewing"""
-    session = dubbing_pipeline.get_session(session_id)
+    session = await dubbing_pipeline.get_session(session_id)
     if not session or session["status"] != "completed":
         raise HTTPException(status_code=404, detail="Video not found or not ready")
     
     video_path = session.get("dubbed_video_path")
-    if not video_path or not os.path.exists(video_path):
-        raise HTTPException(status_code=404, detail="Video file not found")
+    file_stat = await stat_video_file(video_path)
     
-    return FileResponse(
-        video_path,
-        media_type="video/mp4",
-        headers={"Content-Disposition": "inline"}
-    )
+    return serve_video_file(request, video_path, file_stat, {"Content-Disposition": "inline"})
 
 @app.get("/download/{session_id}")
-async def download_video(session_id: str):
+async def download_video(session_id: str, request: Request):
     """Download dubbed video file"""
-    session = dubbing_pipeline.get_session(session_id)
+    session = await dubbing_pipeline.get_session(session_id)
     if not session or session["status"] != "completed":
         raise HTTPException(status_code=404, detail="Video not found or not ready")
     
     dubbed_video_path = session.get("dubbed_video_path")
-    if not dubbed_video_path or not os.path.exists(dubbed_video_path):
-        raise HTTPException(status_code=404, detail="Video file not found")
+    file_stat = await stat_video_file(dubbed_video_path)
     
-    return FileResponse(
+    return serve_video_file(
+        request,
         dubbed_video_path,
+        file_stat,
+        {"Content-Disposition": f'attachment; filename="dubbed_video_{session_id}.mp4"'}
+    )
+
+
+async def stat_video_file(file_path: Optional[str]) -> os.stat_result:
+    """Stat a dubbed video once (off the event loop), raising 404 if it's missing"""
+    if not file_path:
+        raise HTTPException(status_code=404, detail="Video file not found")
+    try:
+        return await asyncio.to_thread(os.stat, file_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Video file not found")
+
+
+async def iter_file_range(file_path: str, start: int, end: int):
+    """Yield bytes start..end (inclusive) of a file in chunks"""
+    async with aiofiles.open(file_path, 'rb') as f:
+        await f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await f.read(min(VIDEO_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def serve_video_file(
+    request: Request,
+    file_path: str,
+    file_stat: os.stat_result,
+    headers: Dict[str, str]
+) -> Response:
+    """
+    Serve a video file, honouring single byte-range requests so players can seek
+    
+    file_stat comes from stat_video_file, so the file is stat'ed once per request.
+    
+    If X_ACCEL_REDIRECT_PREFIX is configured the transfer is handed off to nginx,
+    which serves the file with sendfile(2) and handles ranges itself.
+    """
+    if config.X_ACCEL_REDIRECT_PREFIX:
+        relative_path = os.path.relpath(file_path, config.TEMP_DIR_BASE)
+        internal_path = f"{config.X_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{relative_path}"
+        return Response(
+            media_type="video/mp4",
+            headers={**headers, "X-Accel-Redirect": internal_path}
+        )
+    
+    headers = {**headers, "Accept-Ranges": "bytes"}
+    match = RANGE_HEADER_PATTERN.match(request.headers.get("range", "").strip())
+    if not match or not any(match.groups()):
+        # No (or unsupported multi-part) range - send the whole file
+        return FileResponse(file_path, media_type="video/mp4", headers=headers, stat_result=file_stat)
+    
+    file_size = file_stat.st_size
+    start_str, end_str = match.groups()
+    if start_str:
+        start = int(start_str)
+        end = min(int(end_str), file_size - 1) if end_str else file_size - 1
+    else:
+        # Suffix range: the last N bytes
+        start = max(file_size - int(end_str), 0)
+        end = file_size - 1
+    
+    if start >= file_size or start > end:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{file_size}"})
+    
+    headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        iter_file_range(file_path, start, end),
+        status_code=206,
         media_type="video/mp4",
-        filename=f"dubbed_video_{session_id}.mp4"
+        headers=headers
     )
 
 
 async def process_dubbing(session_id: str, dub_request: DubRequest):
     """Background task to process video dubbing"""
-    session = dubbing_pipeline.get_session(session_id)
-    
     try:
-        session["status"] = "transcribing"
-        session["progress"] = 10
-        print(f"[DUBBING {session_id}] Starting transcription...")
-        print(f"[DUBBING {session_id}] Temp files will be stored in: {config.get_temp_dir(session_id)}")
+        await dubbing_pipeline.update_session(session_id, status="transcribing", progress=10)
+        logger.info("[DUBBING %s] Starting transcription...", session_id)
+        logger.info("[DUBBING %s] Temp files will be stored in: %s", session_id, config.get_temp_dir(session_id))
         
         # Step 1: Transcribe video
-        transcription_result = await process_video_transcription(str(dub_request.url), session_id)
+        transcription_result = await process_video_transcription(
+            str(dub_request.url), session_id, keep_video=True
+        )
         if not transcription_result["success"]:
-            session["status"] = "failed"
-            session["error"] = "Transcription failed"
-            print(f"[DUBBING {session_id}] Transcription failed")
+            await dubbing_pipeline.update_session(session_id, status="failed", error="Transcription failed")
+            logger.error("[DUBBING %s] Transcription failed", session_id)
             return
         
-        session["progress"] = 30
-        session["status"] = "translating"
-        print(f"[DUBBING {session_id}] Starting translation...")
+        await dubbing_pipeline.update_session(session_id, status="translating", progress=30)
+        logger.info("[DUBBING %s] Starting translation and voice preparation...", session_id)
         
-        # Step 2: Translate text
-        translated_text = await translate_transcription(
-            transcription_result["transcription"],
-            dub_request.target_language
-        )
-        print(f"[DUBBING {session_id}] Translation completed. Text length: {len(translated_text)}")
-        
-        session["progress"] = 50
-        session["status"] = "generating_voice"
-        print(f"[DUBBING {session_id}] Starting voice generation...")
-        
-        # Step 3: Generate dubbed audio
-        tts_service = TTSService()
         video_processor = VideoProcessor(session_id)
         
-        # Extract audio for voice cloning (if needed)
+        # Deepgram's compressed speech track; only a fallback clone reference
         original_audio_path = transcription_result.get("audio_path")
-        print(f"[DUBBING {session_id}] Original audio path: {original_audio_path}")
+        logger.debug("[DUBBING %s] Original audio path: %s", session_id, original_audio_path)
         
-        # Get voice settings
-        voice_settings = VOICE_PRESETS.get(dub_request.voice_style, VOICE_PRESETS["natural"])
-        print(f"[DUBBING {session_id}] Voice option: {dub_request.voice_option}, Style: {dub_request.voice_style}")
+        logger.info(
+            "[DUBBING %s] Voice option: %s, Style: %s",
+            session_id, dub_request.voice_option, dub_request.voice_style
+        )
         
-        try:
-            # Use synchronized dubbing to preserve timing and pauses
-            dubbed_audio_path = await tts_service.create_synchronized_dubbed_audio(
-                transcription_result["transcription_data"],
-                translated_text,
-                original_audio_path,
+        async def prepare_voice():
+            # Clone from a trimmed, filtered excerpt of the kept source video, piped
+            # straight from ffmpeg into the upload: the transcription track is 16kHz
+            # Opus, too lossy to clone well from
+            reference_audio = None
+            source_video_path = transcription_result.get("video_path")
+            if dub_request.voice_option == "clone" and source_video_path:
+                try:
+                    reference_audio = await video_processor.extract_audio_bytes(source_video_path)
+                except HTTPException as e:
+                    logger.warning("[DUBBING %s] Could not prepare clone reference, using transcription audio: %s", session_id, e.detail)
+            
+            return await tts_service.resolve_voice(
                 dub_request.voice_option,
-                voice_settings,
+                original_audio_path,
+                dub_request.target_language,
                 session_id,
-                dub_request.target_language
+                reference_audio=reference_audio
             )
-            print(f"[DUBBING {session_id}] Synchronized voice generation completed: {dubbed_audio_path}")
+        
+        # Step 2: Translate the utterances while the voice is extracted, cloned and
+        # resolved - the two branches are independent and only need the transcription
+        utterances = tts_service.build_utterances(transcription_result["transcription_data"], session_id)
+        translations, (voice_id, voice_settings) = await asyncio.gather(
+            tts_service.translate_utterances(utterances, dub_request.target_language, session_id),
+            prepare_voice()
+        )
+        logger.info("[DUBBING %s] Translation completed. Utterances: %d", session_id, len(translations))
+        
+        await dubbing_pipeline.update_session(session_id, status="generating_voice", progress=50)
+        logger.info("[DUBBING %s] Starting voice generation...", session_id)
+        
+        # Step 3: Generate dubbed audio
+        try:
+            # Use synchronized dubbing to preserve timing and pauses
+            try:
+                dubbed_audio_path = await tts_service.create_synchronized_dubbed_audio(
+                    transcription_result["transcription_data"],
+                    voice_id,
+                    voice_settings,
+                    session_id,
+                    dub_request.target_language,
+                    utterances=utterances,
+                    translations=translations
+                )
+            except VoiceNotFoundError:
+                if dub_request.voice_option != "clone":
+                    raise
+                # A cached clone was deleted (e.g. evicted by another worker): forget it and clone again
+                logger.warning("[DUBBING %s] Cloned voice %s no longer exists, re-cloning", session_id, voice_id)
+                await tts_service.elevenlabs.forget_voice(voice_id)
+                voice_id, voice_settings = await prepare_voice()
+                dubbed_audio_path = await tts_service.create_synchronized_dubbed_audio(
+                    transcription_result["transcription_data"],
+                    voice_id,
+                    voice_settings,
+                    session_id,
+                    dub_request.target_language,
+                    utterances=utterances,
+                    translations=translations
+                )
+            logger.info("[DUBBING %s] Synchronized voice generation completed: %s", session_id, dubbed_audio_path)
         except Exception as tts_error:
-            print(f"[DUBBING {session_id}] TTS ERROR: {str(tts_error)}")
+            logger.error("[DUBBING %s] TTS ERROR: %s", session_id, tts_error)
             raise tts_error
         
-        session["progress"] = 80
-        session["status"] = "combining_video"
-        print(f"[DUBBING {session_id}] Starting video combination...")
+        await dubbing_pipeline.update_session(session_id, status="combining_video", progress=80)
+        logger.info("[DUBBING %s] Starting video combination...", session_id)
         
         # Step 4: Combine with original video
         original_video_path = transcription_result.get("video_path")
-        print(f"[DUBBING {session_id}] Original video path: {original_video_path}")
+        logger.debug("[DUBBING %s] Original video path: %s", session_id, original_video_path)
         
         try:
             dubbed_video_path = await video_processor.combine_video_with_dubbed_audio(
@@ -306,23 +439,36 @@ async def process_dubbing(session_id: str, dub_request: DubRequest):
                 dubbed_audio_path,
                 transcription_result["transcription_data"]
             )
-            print(f"[DUBBING {session_id}] Video combination completed: {dubbed_video_path}")
+            logger.info("[DUBBING %s] Video combination completed: %s", session_id, dubbed_video_path)
         except Exception as video_error:
-            print(f"[DUBBING {session_id}] VIDEO COMBINATION ERROR: {str(video_error)}")
+            logger.error("[DUBBING %s] VIDEO COMBINATION ERROR: %s", session_id, video_error)
             raise video_error
         
-        session["dubbed_video_path"] = dubbed_video_path
-        session["progress"] = 100
-        session["status"] = "completed"
-        print(f"[DUBBING {session_id}] Dubbing completed successfully!")
+        await dubbing_pipeline.update_session(
+            session_id,
+            status="completed",
+            progress=100,
+            dubbed_video_path=dubbed_video_path
+        )
+        logger.info("[DUBBING %s] Dubbing completed successfully!", session_id)
         
     except Exception as e:
         error_msg = str(e)
-        print(f"[DUBBING {session_id}] PIPELINE ERROR: {error_msg}")
-        session["status"] = "failed"
-        session["error"] = error_msg
+        logger.error("[DUBBING %s] PIPELINE ERROR: %s", session_id, error_msg)
+        await dubbing_pipeline.update_session(session_id, status="failed", error=error_msg)
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host=config.HOST, port=config.PORT) 
+    # uvloop/httptools ship with uvicorn[standard]; multiple workers need an import string
+    uvicorn.run(
+        "main:app" if config.WORKERS > 1 else app,
+        host=config.HOST,
+        port=config.PORT,
+        loop="uvloop",
+        http="httptools",
+        workers=config.WORKERS,
+        backlog=config.BACKLOG,
+        limit_concurrency=config.LIMIT_CONCURRENCY or None
+    )
+
@@ -1,96 +1,170 @@
+import asyncio
 import os
 import tempfile
 import shutil
-import ffmpeg
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
-import yt_dlp
-from deepgram import Deepgram
+import aiofiles
+import orjson
 from fastapi import HTTPException
 
 from config import config
+from http_client import shared_http
+from logger import get_logger
 
 
-def get_deepgram_client() -> Deepgram:
-    """Initialize and return Deepgram client"""
+logger = get_logger("transcribe")
+
+
+# Constants
+DEEPGRAM_UPLOAD_TIMEOUT = 300.0
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# yt-dlp downloads and ffmpeg audio extraction are synchronous; run them here
+# so they don't stall the event loop
+_DOWNLOAD_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="download")
+
+# Files yt-dlp may produce for the requested formats
+MEDIA_EXTENSIONS = frozenset(('.mp4', '.mkv', '.avi', '.mov', '.webm', '.m4a', '.opus', '.ogg', '.mp3'))
+
+# Downloads already in one of these mono formats are uploaded to Deepgram as-is
+TRANSCRIPTION_AUDIO_CODECS = ('opus', 'flac')
+TRANSCRIPTION_SAMPLE_RATES = (16000, 22050)
+
+FFMPEG_ERROR_TAIL_CHARS = 2000  # End of ffmpeg's stderr reported when extraction fails
+
+# Per-word fields kept from the Deepgram response; the rest (confidence,
+# punctuated_word, speaker_confidence, ...) is dropped to keep long transcripts small
+WORD_FIELDS = ('word', 'start', 'end', 'speaker')
+
+# Content types sent to Deepgram, by audio file extension
+_MIMETYPE_MAP = {
+    '.wav': 'audio/wav',
+    '.mp3': 'audio/mpeg',
+    '.m4a': 'audio/mp4',
+    '.webm': 'audio/webm',
+    '.opus': 'audio/opus',
+    '.ogg': 'audio/ogg',
+    '.flac': 'audio/flac'
+}
+
+# yt-dlp options shared by every download; 'format' and 'outtmpl' are set per call
+_YDL_OPTS_BASE = {
+    'noplaylist': True,
+    'quiet': True,
+    'no_warnings': False,
+    # Enhanced headers to better mimic a real browser
+    'http_headers': {
+        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'en-us,en;q=0.5',
+        'Accept-Encoding': 'gzip,deflate',
+        'Accept-Charset': 'ISO-8859-1,utf-8;q=0.7,*;q=0.7',
+        'Keep-Alive': '300',
+        'Connection': 'keep-alive',
+    },
+    # Retry options
+    'retries': 5,
+    'fragment_retries': 5,
+    # Use cookies if available
+    'cookiesfrombrowser': None,
+    # Enhanced YouTube-specific options
+    'extractor_args': {
+        'youtube': {
+            'player_client': ['web', 'tv_embed'],
+            'player_skip': ['webpage', 'configs'],
+            'skip': ['hls', 'dash'],
+        }
+    },
+    # Additional anti-detection options
+    'ignoreerrors': False,
+    'age_limit': None,
+    'writesubtitles': False,
+    'writeautomaticsub': False,
+}
+
+
+def get_deepgram_headers(mimetype: str, content_length: int) -> Dict[str, str]:
+    """Build request headers for a raw audio upload to Deepgram"""
     api_key = config.DEEPGRAM_API_KEY
     if not api_key:
         raise HTTPException(
             status_code=500, 
             detail="DEEPGRAM_API_KEY not found in environment variables"
         )
-    return Deepgram(api_key)
+    return {
+        "Authorization": f"Token {api_key}",
+        "Content-Type": mimetype,
+        "Content-Length": str(content_length)
+    }
+
 
+async def iter_file_chunks(file_path: str, chunk_size: int = UPLOAD_CHUNK_SIZE):
+    """Yield a file's contents in chunks without loading it into memory"""
+    async with aiofiles.open(file_path, 'rb') as f:
+        while True:
+            chunk = await f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
 
-def download_video_audio(video_url: str, temp_dir: str) -> tuple[str, Dict[str, Any]]:
+
+def find_media_file(directory: str) -> Optional[str]:
+    """Return the first downloaded media file in a directory, if any"""
+    with os.scandir(directory) as entries:
+        return next(
+            (
+                entry.path for entry in entries
+                if entry.is_file() and os.path.splitext(entry.name)[1].lower() in MEDIA_EXTENSIONS
+            ),
+            None
+        )
+
+
+def download_video_audio(video_url: str, temp_dir: str, keep_video: bool = False) -> tuple[str, Optional[str], Dict[str, Any]]:
     """
     Download video from YouTube and extract audio
     
+    The download is converted to a compact mono audio track for Deepgram
+    (see extract_transcription_audio). When the video itself is not required
+    only the audio stream is fetched.
+    
     Args:
         video_url: YouTube video URL
         temp_dir: Temporary directory path for downloads
+        keep_video: Download the full video and keep it next to the audio
     
     Returns:
-        Tuple of (audio_file_path, video_info)
+        Tuple of (audio_file_path, video_file_path, video_info).
+        video_file_path is None unless keep_video is set.
     
     Raises:
         HTTPException: If download fails
     """
+    # Imported lazily - yt-dlp pulls in hundreds of extractor modules
+    import yt_dlp
+    
     # Configure yt-dlp options with better error handling
     ydl_opts = {
-        'format': 'best', 
+        **_YDL_OPTS_BASE,
+        'format': 'best' if keep_video else 'bestaudio/best',
         'outtmpl': os.path.join(temp_dir, '%(title)s.%(ext)s'),
-        'noplaylist': True,
-        'quiet': True,
-        'no_warnings': False,
-        # Enhanced headers to better mimic a real browser
-        'http_headers': {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            'Accept-Language': 'en-us,en;q=0.5',
-            'Accept-Encoding': 'gzip,deflate',
-            'Accept-Charset': 'ISO-8859-1,utf-8;q=0.7,*;q=0.7',
-            'Keep-Alive': '300',
-            'Connection': 'keep-alive',
-        },
-        # Retry options
-        'retries': 5,
-        'fragment_retries': 5,
-        # Use cookies if available
-        'cookiesfrombrowser': None,
-        # Enhanced YouTube-specific options
-        'extractor_args': {
-            'youtube': {
-                'player_client': ['web', 'tv_embed'],
-                'player_skip': ['webpage', 'configs'],
-                'skip': ['hls', 'dash'],
-            }
-        },
-        # Additional anti-detection options
-        'ignoreerrors': False,
-        'age_limit': None,
-        'writesubtitles': False,
-        'writeautomaticsub': False,
     }
     
     try:
-        # Download video and extract audio
+        # Download video (or just its audio)
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
             info = ydl.extract_info(video_url, download=True)
             
-            # Find the downloaded file (should be video now)
-            video_path = None
-            for file in os.listdir(temp_dir):
-                if file.endswith(('.mp4', '.mkv', '.avi', '.mov', '.webm')):
-                    video_path = os.path.join(temp_dir, file)
-                    break
+            # yt-dlp knows the output path; only scan the directory if it disagrees
+            media_path = ydl.prepare_filename(info)
+            if not os.path.exists(media_path):
+                media_path = find_media_file(temp_dir)
         
-        if not video_path or not os.path.exists(video_path):
+        if not media_path or not os.path.exists(media_path):
             raise HTTPException(status_code=500, detail="Failed to download video")
-        
-        # For now, use video file as audio source (we'll extract audio during TTS)
-        return video_path, info
     
     except yt_dlp.DownloadError as e:
         error_msg = str(e)
@@ -120,6 +194,79 @@ def download_video_audio(video_url: str, temp_dir: str) -> tuple[str, Dict[str,
             )
         else:
             raise HTTPException(status_code=500, detail=f"Video download failed: {error_msg}")
+    
+    audio_path = extract_transcription_audio(media_path, temp_dir)
+    return audio_path, (media_path if keep_video else None), info
+
+
+def extract_transcription_audio(media_path: str, temp_dir: str) -> str:
+    """
+    Produce the compact mono audio track uploaded to Deepgram
+    
+    The download is probed first: an audio-only mono Opus/FLAC stream at a
+    speech sample rate is used as-is, skipping a full decode + encode pass.
+    Anything else is re-encoded to 16 kHz mono 24 kbps Opus.
+    
+    Args:
+        media_path: Downloaded video or audio file
+        temp_dir: Directory to write the extracted audio to
+    
+    Returns:
+        Path to the audio file to transcribe
+    
+    Raises:
+        HTTPException: If the file has no audio or extraction fails
+    """
+    import ffmpeg
+    
+    try:
+        streams = ffmpeg.probe(media_path).get('streams', [])
+        audio_stream = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+        if audio_stream is None:
+            raise HTTPException(status_code=400, detail="Video has no audio track")
+        
+        has_video = any(s.get('codec_type') == 'video' for s in streams)
+        if (
+            not has_video
+            and audio_stream.get('codec_name') in TRANSCRIPTION_AUDIO_CODECS
+            and int(audio_stream.get('channels', 0)) == 1
+            and int(audio_stream.get('sample_rate', 0)) in TRANSCRIPTION_SAMPLE_RATES
+        ):
+            logger.info("[TRANSCRIPTION] Download is already mono %s, skipping re-encode", audio_stream['codec_name'])
+            return media_path
+        
+        audio_path = os.path.join(temp_dir, "transcription_audio.opus")
+        (
+            ffmpeg
+            .input(media_path)
+            .output(audio_path, vn=None, acodec='libopus', ar=16000, ac=1, audio_bitrate='24k')
+            .overwrite_output()
+            .run(quiet=True)
+        )
+        return audio_path
+    
+    except HTTPException:
+        raise
+    except ffmpeg.Error as e:
+        # str(e) is only "ffmpeg error (see stderr output for detail)"; report the stderr itself
+        error_msg = e.stderr.decode(errors="replace").strip()[-FFMPEG_ERROR_TAIL_CHARS:] if e.stderr else str(e)
+        logger.error("[TRANSCRIPTION] FFmpeg audio extraction failed: %s", error_msg)
+        raise HTTPException(status_code=500, detail=f"Failed to extract audio from video: {error_msg}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to extract audio from video: {str(e)}")
+
+
+def slim_words(words: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Keep only the word fields used downstream (timing, text and speaker)"""
+    return [{key: word[key] for key in WORD_FIELDS if key in word} for word in words]
+
+
+def slim_utterances(utterances: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Copy utterances without their nested per-word lists"""
+    return [
+        {key: value for key, value in utterance.items() if key != "words"}
+        for utterance in utterances
+    ]
 
 
 async def transcribe_audio_file(audio_path: str) -> Dict[str, Any]:
@@ -136,28 +283,11 @@ async def transcribe_audio_file(audio_path: str) -> Dict[str, Any]:
         HTTPException: If transcription fails
     """
     try:
-        deepgram = get_deepgram_client()
-        
         # Determine mimetype based on file extension
         file_ext = Path(audio_path).suffix.lower()
-        mimetype_map = {
-            '.wav': 'audio/wav',
-            '.mp3': 'audio/mpeg',
-            '.m4a': 'audio/mp4',
-            '.webm': 'audio/webm',
-            '.opus': 'audio/opus',
-            '.ogg': 'audio/ogg',
-            '.flac': 'audio/flac'
-        }
-        mimetype = mimetype_map.get(file_ext, 'audio/wav')
-        
-        with open(audio_path, 'rb') as audio_file:
-            buffer_data = audio_file.read()
-        
-        payload = {
-            "buffer": buffer_data,
-            "mimetype": mimetype
-        }
+        mimetype = _MIMETYPE_MAP.get(file_ext, 'audio/wav')
+        file_size = (await asyncio.to_thread(os.stat, audio_path)).st_size
+        headers = get_deepgram_headers(mimetype, file_size)
         
         options = {
             "model": "nova-2",
@@ -169,7 +299,23 @@ async def transcribe_audio_file(audio_path: str) -> Dict[str, Any]:
             "paragraphs": True,  # Enable paragraph-level timestamps
         }
         
-        response = await deepgram.transcription.prerecorded(payload, options)
+        # Stream the file straight from disk instead of buffering it for the SDK
+        http_response = await shared_http.post(
+            f"{config.DEEPGRAM_BASE_URL}/v1/listen",
+            params=options,
+            headers=headers,
+            content=iter_file_chunks(audio_path),
+            timeout=DEEPGRAM_UPLOAD_TIMEOUT
+        )
+        
+        if http_response.status_code != 200:
+            raise HTTPException(
+                status_code=http_response.status_code,
+                detail=f"Deepgram request failed: {http_response.text}"
+            )
+        
+        response = orjson.loads(http_response.content)
+        del http_response
         
         # Extract transcription text and timestamps
         transcription_data = {
@@ -180,15 +326,15 @@ async def transcribe_audio_file(audio_path: str) -> Dict[str, Any]:
         }
         
         if response and "results" in response:
-            print(f"[TRANSCRIPTION] Deepgram response keys: {list(response.keys())}")
-            print(f"[TRANSCRIPTION] Results keys: {list(response['results'].keys())}")
+            logger.debug("[TRANSCRIPTION] Deepgram response keys: %s", list(response.keys()))
+            logger.debug("[TRANSCRIPTION] Results keys: %s", list(response['results'].keys()))
             
             # Check if utterances are at the results level (Deepgram v2)
             results_utterances = response["results"].get("utterances", [])
-            print(f"[TRANSCRIPTION] Results utterances: {results_utterances}")
+            logger.debug("[TRANSCRIPTION] Results utterances: %s", results_utterances)
             if results_utterances:
-                print(f"[TRANSCRIPTION] Found {len(results_utterances)} utterances at results level")
-                transcription_data["utterances"] = results_utterances
+                logger.info("[TRANSCRIPTION] Found %d utterances at results level", len(results_utterances))
+                transcription_data["utterances"] = slim_utterances(results_utterances)
             
             channels = response["results"].get("channels", [])
             if channels and len(channels) > 0:
@@ -204,18 +350,21 @@ async def transcribe_audio_file(audio_path: str) -> Dict[str, Any]:
                     
                     # Get word-level timestamps
                     words = alternative.get("words", [])
-                    transcription_data["words"] = words
+                    transcription_data["words"] = slim_words(words)
                 
                 # Get utterance-level timestamps (try channel level if not found at results level)
                 if not transcription_data["utterances"]:
                     utterances = channel.get("utterances", [])
-                    transcription_data["utterances"] = utterances
-                    print(f"[TRANSCRIPTION] Found {len(utterances)} utterances at channel level")
+                    transcription_data["utterances"] = slim_utterances(utterances)
+                    logger.info("[TRANSCRIPTION] Found %d utterances at channel level", len(utterances))
                 
                 # Get paragraph-level timestamps
                 paragraphs = channel.get("paragraphs", [])
                 transcription_data["paragraphs"] = paragraphs
         
+        # Drop the raw Deepgram JSON so only the slimmed fields outlive this call
+        del response
+        
         if not transcription_data["text"].strip():
             raise HTTPException(status_code=500, detail="No transcription was generated")
         
@@ -228,13 +377,18 @@ async def transcribe_audio_file(audio_path: str) -> Dict[str, Any]:
             raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
 
 
-async def process_video_transcription(video_url: str, session_id: str = None) -> Dict[str, Any]:
+async def process_video_transcription(
+    video_url: str,
+    session_id: str = None,
+    keep_video: bool = False
+) -> Dict[str, Any]:
     """
     Complete video transcription pipeline: download, extract audio, and transcribe
     
     Args:
         video_url: YouTube video URL
         session_id: Optional session ID for creating predictable temp directories
+        keep_video: Also keep the downloaded video (needed for dubbing)
     
     Returns:
         Dictionary containing transcription results
@@ -247,33 +401,26 @@ async def process_video_transcription(video_url: str, session_id: str = None) ->
         # Create predictable temporary directory
         if session_id:
             temp_dir = config.get_temp_dir(session_id)
-            os.makedirs(temp_dir, exist_ok=True)
-            print(f"[TRANSCRIPTION {session_id}] Using temp dir: {temp_dir}")
+            await asyncio.to_thread(os.makedirs, temp_dir, exist_ok=True)
+            logger.info("[TRANSCRIPTION %s] Using temp dir: %s", session_id, temp_dir)
         else:
-            temp_dir = tempfile.mkdtemp()
-            print(f"[TRANSCRIPTION] Using temp dir: {temp_dir}")
+            temp_dir = await asyncio.to_thread(tempfile.mkdtemp)
+            logger.info("[TRANSCRIPTION] Using temp dir: %s", temp_dir)
         
-        # Download video 
-        video_path, video_info = download_video_audio(video_url, temp_dir)
+        # Download video and extract audio off the event loop
+        loop = asyncio.get_event_loop()
+        audio_path, video_path, video_info = await loop.run_in_executor(
+            _DOWNLOAD_POOL,
+            download_video_audio,
+            video_url,
+            temp_dir,
+            keep_video
+        )
         
         # Extract video metadata
         video_title = video_info.get('title', 'Unknown')
         duration = video_info.get('duration', 0)
         
-        # Extract audio from video for transcription
-        audio_path = os.path.join(temp_dir, "extracted_audio.wav")
-        try:
-            # Extract audio from video
-            (
-                ffmpeg
-                .input(video_path)
-                .output(audio_path, acodec='pcm_s16le', ar=22050, ac=1)
-                .overwrite_output()
-                .run(quiet=True)
-            )
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to extract audio from video: {str(e)}")
-        
         # Transcribe audio
         transcription_data = await transcribe_audio_file(audio_path)
         
@@ -283,8 +430,8 @@ async def process_video_transcription(video_url: str, session_id: str = None) ->
             "transcription_data": transcription_data,  # Full timing data for dubbing
             "video_title": video_title,
             "duration": duration,
-            "audio_path": audio_path,  # Extracted audio for voice cloning
-            "video_path": video_path  # Original video file for dubbing
+            "audio_path": audio_path,  # Low-bitrate speech track sent to Deepgram (clone reference of last resort)
+            "video_path": video_path  # Original video file for dubbing (None unless keep_video)
         }
         
     except HTTPException:
@@ -296,4 +443,4 @@ async def process_video_transcription(video_url: str, session_id: str = None) ->
     
     finally:
         # Files are kept in /tmp/video-dub/<session_id> for manual cleanup
-        print(f"[TRANSCRIPTION] Temp files preserved in: {temp_dir}") 
+        logger.debug("[TRANSCRIPTION] Temp files preserved in: %s", temp_dir)
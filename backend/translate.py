@@ -1,9 +1,58 @@
+import functools
+import hashlib
 import httpx
-from typing import Dict, Any, Protocol
+import re
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Protocol
 from fastapi import HTTPException
-from googletrans import Translator
 import asyncio
 
+from logger import get_logger
+
+
+logger = get_logger("translate")
+
+
+# Keep each request comfortably below the free Google Translate size limit
+MAX_CHUNK_CHARS = 4500
+
+# Segments are joined with this marker so a batch costs one request instead of
+# one per segment; googletrans' list form still makes a request per item
+SEGMENT_SEPARATOR = "\n<<<SEP>>>\n"
+_SEPARATOR_PATTERN = re.compile(r"\s*<<<\s*SEP\s*>>>\s*")
+
+# Dedicated pool for blocking googletrans calls so translations don't queue
+# behind long-running work (downloads, ffmpeg) on the default executor
+_TRANSLATE_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="xlate")
+
+# LRU cache of successful translations, keyed by (text digest, target language).
+# Re-dubbing a video (new voice, same language) then skips the translate round trip.
+TRANSLATION_CACHE_SIZE = 1024
+_translation_cache: "OrderedDict[str, str]" = OrderedDict()
+
+
+def _translation_cache_key(text: str, target_language: str) -> str:
+    """Cache key for a translation"""
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+    return f"{digest}:{target_language}"
+
+
+def _get_cached_translation(text: str, target_language: str) -> Optional[str]:
+    """Return a cached translation and mark it as recently used"""
+    key = _translation_cache_key(text, target_language)
+    translated = _translation_cache.get(key)
+    if translated is not None:
+        _translation_cache.move_to_end(key)
+    return translated
+
+
+def _cache_translation(text: str, target_language: str, translated: str):
+    """Store a translation, evicting the least recently used entry when full"""
+    _translation_cache[_translation_cache_key(text, target_language)] = translated
+    if len(_translation_cache) > TRANSLATION_CACHE_SIZE:
+        _translation_cache.popitem(last=False)
+
 
 class TranslationProvider(Protocol):
     """Protocol for translation providers - allows easy swapping of APIs"""
@@ -11,6 +60,20 @@ class TranslationProvider(Protocol):
     async def translate_text(self, text: str, target_language: str) -> str:
         """Translate text to target language"""
         ...
+    
+    async def translate_batch(self, texts: List[str], target_language: str) -> List[str]:
+        """Translate several texts to target language, preserving order"""
+        ...
+
+
+@functools.lru_cache(maxsize=None)
+def _get_shared_translator():
+    """
+    Shared googletrans client - each Translator() sets up its own HTTP client and
+    token cache. Created on first use since googletrans is slow to import.
+    """
+    from googletrans import Translator
+    return Translator()
 
 
 class GoogleTranslateFreeTranslator:
@@ -18,7 +81,7 @@ class GoogleTranslateFreeTranslator:
     
     def __init__(self, api_key: str = None):
         # No API key needed for free service
-        self.translator = Translator()
+        self.translator = _get_shared_translator()
     
     async def translate_text(self, text: str, target_language: str) -> str:
         """
@@ -31,22 +94,85 @@ class GoogleTranslateFreeTranslator:
         Returns:
             Translated text
         """
+        cached = _get_cached_translation(text, target_language)
+        if cached is not None:
+            return cached
+        
         try:
             # Run the blocking translation in a thread pool to make it async
             loop = asyncio.get_event_loop()
             result = await loop.run_in_executor(
-                None, 
+                _TRANSLATE_POOL, 
                 lambda: self.translator.translate(text, dest=target_language)
             )
             
+            _cache_translation(text, target_language, result.text)
             return result.text
             
         except Exception as e:
             # Fallback to placeholder if translation fails
             language_name = SUPPORTED_LANGUAGES.get(target_language, target_language)
-            print(f"Translation failed: {e}, using fallback")
+            logger.warning("Translation failed: %s, using fallback", e)
             return f"[Translation service unavailable - {language_name}] {text}"
-
+    
+    async def translate_batch(self, texts: List[str], target_language: str) -> List[str]:
+        """
+        Translate several texts in a single googletrans call
+        
+        Args:
+            texts: Texts to translate
+            target_language: Target language code (e.g., 'es', 'fr', 'de')
+        
+        Returns:
+            Translated texts, in the same order as the input
+        """
+        translations = [_get_cached_translation(text, target_language) for text in texts]
+        missing = [text for text, translated in zip(texts, translations) if translated is None]
+        if not missing:
+            return translations
+        
+        try:
+            # Pack segments into separator-joined groups below the request size limit
+            groups = pack_segments(missing)
+            loop = asyncio.get_event_loop()
+            group_results = await asyncio.gather(*(
+                loop.run_in_executor(_TRANSLATE_POOL, self._translate_joined, group, target_language)
+                for group in groups
+            ))
+            missing_translations = iter([translated for group in group_results for translated in group])
+            
+        except Exception as e:
+            language_name = SUPPORTED_LANGUAGES.get(target_language, target_language)
+            logger.warning("Batch translation failed: %s, using fallback", e)
+            return [
+                translated if translated is not None
+                else f"[Translation service unavailable - {language_name}] {text}"
+                for text, translated in zip(texts, translations)
+            ]
+        
+        for i, text in enumerate(texts):
+            if translations[i] is None:
+                translations[i] = next(missing_translations)
+                _cache_translation(text, target_language, translations[i])
+        return translations
+    
+    def _translate_joined(self, texts: List[str], target_language: str) -> List[str]:
+        """
+        Translate texts in one request by joining them with SEGMENT_SEPARATOR
+        
+        Falls back to translating each text separately if the separators did
+        not survive translation (segment count mismatch).
+        """
+        result = self.translator.translate(SEGMENT_SEPARATOR.join(texts), dest=target_language)
+        translated = _SEPARATOR_PATTERN.split(result.text.strip())
+        if len(translated) == len(texts):
+            return translated
+        
+        logger.warning(
+            "Joined translation returned %d segments for %d inputs, translating individually",
+            len(translated), len(texts)
+        )
+        return [result.text for result in self.translator.translate(texts, dest=target_language)]
 
 
 class GoogleTranslateProvider:
@@ -58,6 +184,10 @@ class GoogleTranslateProvider:
     async def translate_text(self, text: str, target_language: str) -> str:
         """Google Translate implementation - not implemented yet"""
         raise HTTPException(status_code=501, detail="Google Translate not implemented yet")
+    
+    async def translate_batch(self, texts: List[str], target_language: str) -> List[str]:
+        """Google Translate implementation - not implemented yet"""
+        raise HTTPException(status_code=501, detail="Google Translate not implemented yet")
 
 
 # Supported languages mapping
@@ -86,6 +216,55 @@ SUPPORTED_LANGUAGES = {
 }
 
 
+def split_text_chunks(text: str, max_chars: int = MAX_CHUNK_CHARS) -> List[str]:
+    """
+    Split text on sentence boundaries into chunks of at most max_chars
+    
+    A single sentence longer than max_chars is kept as its own chunk.
+    """
+    chunks = []
+    current = ""
+    for sentence in re.split(r'(?<=[.!?])\s+', text.strip()):
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def pack_segments(texts: List[str], max_chars: int = MAX_CHUNK_CHARS) -> List[List[str]]:
+    """
+    Group consecutive segments so each separator-joined group stays under max_chars
+    
+    Args:
+        texts: Segments to group, in order
+        max_chars: Maximum length of a joined group (a longer single segment gets its own group)
+    
+    Returns:
+        Groups of segments; flattening them gives back the input order
+    """
+    groups: List[List[str]] = []
+    current: List[str] = []
+    current_len = 0
+    
+    for text in texts:
+        added_len = len(text) + (len(SEGMENT_SEPARATOR) if current else 0)
+        if current and current_len + added_len > max_chars:
+            groups.append(current)
+            current, current_len = [], 0
+            added_len = len(text)
+        current.append(text)
+        current_len += added_len
+    
+    if current:
+        groups.append(current)
+    return groups
+
+
 def get_translator(provider: str = "google_free") -> TranslationProvider:
     """
     Factory function to get translation provider
@@ -123,4 +302,32 @@ async def translate_transcription(text: str, target_language: str, provider: str
         )
     
     translator = get_translator(provider)
-    return await translator.translate_text(text, target_language) 
+    chunks = split_text_chunks(text)
+    if len(chunks) <= 1:
+        return await translator.translate_text(text, target_language)
+    
+    # Long transcripts: translate sentence-aligned chunks as one batch
+    translated_chunks = await translator.translate_batch(chunks, target_language)
+    return " ".join(translated_chunks)
+
+
+async def translate_segments(texts: List[str], target_language: str, provider: str = "google_free") -> List[str]:
+    """
+    Translate a batch of transcript segments (e.g. utterances) to target language
+    
+    Args:
+        texts: Segments to translate
+        target_language: Language code (e.g., 'es', 'fr', 'de')
+        provider: Translation provider to use
+    
+    Returns:
+        Translated segments, in the same order as the input
+    """
+    if target_language not in SUPPORTED_LANGUAGES:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Unsupported language: {target_language}. Supported: {list(SUPPORTED_LANGUAGES.keys())}"
+        )
+    
+    translator = get_translator(provider)
+    return await translator.translate_batch(texts, target_language)
@@ -6,15 +6,32 @@ Handles voice generation, cloning, and audio processing for video dubbing.
 """
 
 import os
+import hashlib
+import logging
+import json
+import mimetypes
+import re
+import shutil
+import unicodedata
 import tempfile
 import asyncio
-from typing import Dict, Any, List, Optional
+import fcntl
+import time
+from types import MappingProxyType
+from typing import Callable, Dict, Any, List, Mapping, Optional, Union
 from pathlib import Path
 
+import aiofiles
 import httpx
+import orjson
 from fastapi import HTTPException
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
 
 from config import config
+from logger import get_logger
+
+
+logger = get_logger("tts")
 
 
 # Constants
@@ -22,30 +39,260 @@ REQUEST_TIMEOUT = 60.0
 VOICE_FETCH_TIMEOUT = 30.0
 DEFAULT_VOICE_NAME = "temp_cloned_voice"
 AUDIO_FORMAT = "mp3"
+SYNTHESIS_CONCURRENCY = 8  # TTS requests in flight per dubbing session
+VOICES_CONCURRENCY = 2  # Voice listing, cloning and deletion requests in flight per process
+SYNTHESIS_ATTEMPTS = 4  # Tries per synthesis when ElevenLabs times out, throttles or returns 5xx
+RETRYABLE_STATUS_CODES = frozenset((429, 500, 502, 503, 504))
+FULL_TEXT_SEGMENT_CHARS = 800  # Sentence-aligned segment size when dubbing without utterance timing
+STREAM_CHUNK_SIZE = 64 * 1024  # Bytes per write when streaming synthesized audio to disk
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+SEGMENT_SAMPLE_RATE = 44100  # Matches SYNTHESIS_PARAMS output_format; silence gaps are encoded to match
+SEGMENT_BITRATE = "128k"
+# The timed dub is encoded to AAC once while its segments are joined, so the
+# final video mux can stream-copy it instead of transcoding MP3 there
+DUB_AUDIO_FORMAT = "m4a"
+DUB_AUDIO_CODEC = "aac"
+# Pin the synthesized format so utterances concat without resampling, and
+# use ElevenLabs' latency-optimized tier to cut time to first byte
+SYNTHESIS_PARAMS = {
+    "output_format": "mp3_44100_128",
+    "optimize_streaming_latency": 3
+}
+VOICES_CACHE_TTL = 3600.0  # Seconds the voice catalog is reused before refetching
+SYNTH_CACHE_SWEEP_INTERVAL = 3600.0  # Seconds between sweeps for expired synthesis cache files
+MIN_CLONE_AUDIO_BYTES = 1024
+MIN_CLONE_AUDIO_SECONDS = 1.0  # Shorter reference audio isn't worth uploading for a clone
+WAV_HEADER_BYTES = 44
+CLONE_WAV_BYTES_PER_SECOND = 22050 * 2  # Mono 16-bit 22kHz, as VideoProcessor.extract_audio_bytes produces
+
+# Voice settings sent with every synthesis request unless overridden
+DEFAULT_VOICE_SETTINGS = MappingProxyType({
+    "stability": 0.5,
+    "similarity_boost": 0.8,
+    "style": 0.0,
+    "use_speaker_boost": True
+})
+
+# Stronger similarity settings used for cloned voices
+CLONED_VOICE_SETTINGS = MappingProxyType({
+    "stability": 0.3,  # Lower stability for more expressive speech
+    "similarity_boost": 0.95,  # Higher similarity to match original voice
+    "style": 0.0,  # Neutral style
+    "use_speaker_boost": True
+})
+
+# Sentence boundaries used to build synthetic utterances when Deepgram returns none
+_SENTENCE_SPLIT = re.compile(r'[.!?]+')
+
+
+# Cap on concurrent synthesis requests across all sessions in this process, so
+# parallel dubs queue here instead of tripping the account's 429 limit; whatever
+# several workers still overshoot is retried on 429. Held per attempt, so retry
+# backoff doesn't occupy a slot.
+_ELEVENLABS_SEMAPHORE = asyncio.Semaphore(config.ELEVENLABS_MAX_CONCURRENCY)
+# Voice listing, cloning and deletion get their own small limit, so they neither
+# queue behind a long dub's syntheses nor take slots from them
+_ELEVENLABS_VOICES_SEMAPHORE = asyncio.Semaphore(VOICES_CONCURRENCY)
+
+
+class VoiceNotFoundError(HTTPException):
+    """Synthesis asked for a voice ElevenLabs no longer has, e.g. a clone another worker evicted"""
+    
+    def __init__(self, voice_id: str):
+        super().__init__(status_code=404, detail=f"Voice not found: {voice_id}")
+        self.voice_id = voice_id
+
+
+class TransientSynthesisError(HTTPException):
+    """ElevenLabs throttled, failed server-side, timed out or couldn't be reached"""
+
+
+def _is_transient_error(error: BaseException) -> bool:
+    """
+    Synthesis failures worth retrying
+    
+    Only upstream trouble counts: local failures (e.g. writing dest_path) surface
+    as a plain HTTPException(500) and are not retried.
+    """
+    return isinstance(error, TransientSynthesisError)
+
+
+# Retry transient synthesis failures with jittered exponential backoff,
+# re-raising the last HTTPException once attempts run out
+_retry_transient = retry(
+    retry=retry_if_exception(_is_transient_error),
+    wait=wait_exponential_jitter(initial=0.5, max=10),
+    stop=stop_after_attempt(SYNTHESIS_ATTEMPTS),
+    reraise=True
+)
+
+
+def create_elevenlabs_client(api_key: str) -> httpx.AsyncClient:
+    """
+    Create the pooled ElevenLabs client
+    
+    Base URL and auth header are set once, so requests use relative paths. The
+    TLS handshake is paid once and per-utterance synthesis multiplexes over HTTP/2.
+    """
+    return httpx.AsyncClient(
+        base_url=config.ELEVENLABS_BASE_URL,
+        headers={"xi-api-key": api_key},
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS
+        ),
+        timeout=REQUEST_TIMEOUT
+    )
 
 
 class ElevenLabsTTS:
     """ElevenLabs Text-to-Speech implementation"""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, client: Optional[httpx.AsyncClient] = None):
+        """
+        Args:
+            api_key: ElevenLabs API key
+            client: Client from create_elevenlabs_client to share; the instance
+                creates (and later closes) its own when omitted
+        """
         self.api_key = api_key
         self.base_url = config.ELEVENLABS_BASE_URL
+        self._owns_client = client is None
+        self._client = client or create_elevenlabs_client(api_key)
+        # (fetched_at, voices) from the last successful catalog fetch
+        self._voices_cache: Optional[tuple[float, List[Dict[str, Any]]]] = None
+        self._voices_lock = asyncio.Lock()
+        # Cache path -> event set when the synthesis currently fetching it finishes,
+        # so sessions dubbing the same line share one ElevenLabs request
+        self._inflight_synthesis: Dict[str, asyncio.Event] = {}
+        # Monotonic time of the last synthesis cache sweep (0 = sweep on first store)
+        self._synth_cache_swept_at = 0.0
+        self._synth_cache_sweep: Optional[asyncio.Task] = None
+        # Voices already cloned from identical reference audio, so retries and
+        # re-dubs into another language don't upload and clone again. The file is
+        # shared by every worker, so it is the source of truth: it is re-read for
+        # each lookup and read-modified-written under a lock for each change.
+        self._clone_cache_path = config.CLONE_CACHE_PATH
+    
+    def _load_clone_cache(self) -> Dict[str, str]:
+        """Load persisted clone IDs (least recently used first), empty if missing or unreadable"""
+        try:
+            with open(self._clone_cache_path, 'r') as cache_file:
+                return json.load(cache_file)
+        except (OSError, ValueError):
+            return {}
+    
+    def _update_clone_cache(self, update: Callable[[Dict[str, str]], None]) -> List[str]:
+        """
+        Apply update to the persisted clone cache under an exclusive file lock
+        
+        The file is re-read inside the lock so concurrent workers merge their
+        changes instead of overwriting each other's entries.
+        
+        Returns:
+            Voice IDs evicted to stay within CLONE_CACHE_MAX_VOICES
+        """
+        os.makedirs(os.path.dirname(self._clone_cache_path), exist_ok=True)
+        with open(f"{self._clone_cache_path}.lock", 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                clone_cache = self._load_clone_cache()
+                update(clone_cache)
+                
+                evicted = []
+                while len(clone_cache) > config.CLONE_CACHE_MAX_VOICES:
+                    evicted.append(clone_cache.pop(next(iter(clone_cache))))
+                
+                # Atomic replace, so lock-free readers never see a partial file
+                tmp_path = f"{self._clone_cache_path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w') as cache_file:
+                    json.dump(clone_cache, cache_file)
+                os.replace(tmp_path, self._clone_cache_path)
+                return evicted
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    async def _remember_clone(self, cache_key: str, voice_id: str):
+        """
+        Record a clone as most recently used and persist the cache
+        
+        ElevenLabs caps the number of custom voices per account, so once the
+        cache holds more than CLONE_CACHE_MAX_VOICES the least recently used
+        clones are deleted from ElevenLabs as well.
+        """
+        def touch(clone_cache: Dict[str, str]):
+            clone_cache.pop(cache_key, None)
+            clone_cache[cache_key] = voice_id
+        
+        try:
+            evicted = await asyncio.to_thread(self._update_clone_cache, touch)
+        except OSError as cache_error:
+            logger.warning("[TTS] Could not persist clone cache: %s", cache_error)
+            return
+        
+        for evicted_voice_id in evicted:
+            await self.delete_voice(evicted_voice_id)
+    
+    async def forget_voice(self, voice_id: str):
+        """Drop a cloned voice that no longer exists on ElevenLabs from the clone cache"""
+        def drop(clone_cache: Dict[str, str]):
+            for cache_key in [key for key, cached in clone_cache.items() if cached == voice_id]:
+                del clone_cache[cache_key]
+        
+        try:
+            await asyncio.to_thread(self._update_clone_cache, drop)
+        except OSError as cache_error:
+            logger.warning("[TTS] Could not persist clone cache: %s", cache_error)
+    
+    async def delete_voice(self, voice_id: str) -> bool:
+        """Delete a cloned voice from ElevenLabs (best effort; failures are logged)"""
+        try:
+            async with _ELEVENLABS_VOICES_SEMAPHORE:
+                response = await self._client.delete(f"/voices/{voice_id}")
+            if response.status_code in (200, 404):
+                logger.info("[TTS] Evicted cloned voice %s", voice_id)
+                return True
+            logger.warning("[TTS] Could not delete cloned voice %s: %s", voice_id, response.text)
+        except httpx.HTTPError as e:
+            logger.warning("[TTS] Could not delete cloned voice %s: %s", voice_id, e)
+        return False
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Pooled HTTP client used for all ElevenLabs requests"""
+        return self._client
+    
+    async def aclose(self):
+        """Close the pooled HTTP client, unless it was passed in by the caller"""
+        if self._owns_client:
+            await self._client.aclose()
+    
+    async def __aenter__(self) -> "ElevenLabsTTS":
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
         
     async def get_available_voices(self) -> List[Dict[str, Any]]:
-        """Get list of available pre-built voices"""
+        """Get list of available pre-built voices (cached for VOICES_CACHE_TTL seconds)"""
         try:
-            headers = {"xi-api-key": self.api_key}
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/voices",
-                    headers=headers,
-                    timeout=VOICE_FETCH_TIMEOUT
-                )
+            # The lock makes concurrent callers on a cold cache share one fetch
+            async with self._voices_lock:
+                if self._voices_cache and time.monotonic() - self._voices_cache[0] < VOICES_CACHE_TTL:
+                    return self._voices_cache[1]
+                
+                async with _ELEVENLABS_VOICES_SEMAPHORE:
+                    response = await self._client.get(
+                        "/voices",
+                        timeout=VOICE_FETCH_TIMEOUT
+                    )
                 
                 if response.status_code == 200:
-                    data = response.json()
-                    return data.get("voices", [])
+                    voices = orjson.loads(response.content).get("voices", [])
+                    self._voices_cache = (time.monotonic(), voices)
+                    return voices
                 else:
                     raise HTTPException(
                         status_code=response.status_code,
@@ -68,97 +315,235 @@ class ElevenLabsTTS:
             Voice ID of cloned voice
         """
         try:
-            print(f"[TTS] Starting voice cloning from {audio_file_path}")
-            headers = {"xi-api-key": self.api_key}
+            logger.info("[TTS] Starting voice cloning from %s", audio_file_path)
             
-            # Read and validate audio file
-            if not os.path.exists(audio_file_path):
+            # Read and validate audio file (one stat, off the event loop)
+            try:
+                file_size = (await asyncio.to_thread(os.stat, audio_file_path)).st_size
+            except FileNotFoundError:
                 raise HTTPException(status_code=400, detail=f"Audio file not found: {audio_file_path}")
             
-            file_size = os.path.getsize(audio_file_path)
-            print(f"[TTS] Audio file size: {file_size} bytes")
+            logger.debug("[TTS] Audio file size: %s bytes", file_size)
             
-            if file_size < 1024:  # Less than 1KB
+            if file_size < MIN_CLONE_AUDIO_BYTES:
                 raise HTTPException(status_code=400, detail="Audio file too small for voice cloning")
             
             # Read the audio file data
-            with open(audio_file_path, 'rb') as audio_file:
-                audio_data = audio_file.read()
+            async with aiofiles.open(audio_file_path, 'rb') as audio_file:
+                audio_data = await audio_file.read()
+            
+            mimetype = mimetypes.guess_type(audio_file_path)[0] or "application/octet-stream"
+            return await self.clone_voice_from_audio_bytes(
+                audio_data,
+                voice_name,
+                filename=os.path.basename(audio_file_path),
+                mimetype=mimetype
+            )
+            
+        except HTTPException as he:
+            # Re-raise HTTP exceptions with their original status and detail
+            raise he
+        except Exception as e:
+            logger.exception("[TTS] Unexpected error during voice cloning from %s", audio_file_path)
+            # Diagnostic stat only in debug, so error bursts don't stall the event loop
+            if logger.isEnabledFor(logging.DEBUG):
+                try:
+                    logger.debug("[TTS] Audio file size: %s bytes", os.stat(audio_file_path).st_size)
+                except FileNotFoundError:
+                    logger.debug("[TTS] Audio file does not exist")
+            raise HTTPException(status_code=500, detail=f"Voice cloning failed: {str(e)}")
+    
+    async def clone_voice_from_audio_bytes(
+        self,
+        audio_data: bytes,
+        voice_name: str = "cloned_voice",
+        filename: str = "audio.wav",
+        mimetype: str = "audio/wav"
+    ) -> str:
+        """
+        Clone voice from in-memory reference audio (e.g. WAV piped from ffmpeg)
+        
+        Args:
+            audio_data: Reference audio bytes; WAV is assumed to be mono 16-bit 22kHz
+            voice_name: Name for the cloned voice
+            filename: File name sent with the upload
+            mimetype: MIME type of audio_data
+            
+        Returns:
+            Voice ID of cloned voice
+        """
+        try:
+            if len(audio_data) < MIN_CLONE_AUDIO_BYTES:
+                raise HTTPException(status_code=400, detail="Audio file too small for voice cloning")
+            if mimetype == "audio/wav":
+                duration = (len(audio_data) - WAV_HEADER_BYTES) / CLONE_WAV_BYTES_PER_SECOND
+                if duration < MIN_CLONE_AUDIO_SECONDS:
+                    raise HTTPException(status_code=400, detail=f"Audio too short for voice cloning ({duration:.2f}s)")
+            
+            digest = hashlib.blake2b(audio_data, digest_size=16)
+            digest.update(voice_name.encode("utf-8"))
+            cache_key = digest.hexdigest()
+            cached_voice_id = (await asyncio.to_thread(self._load_clone_cache)).get(cache_key)
+            if cached_voice_id:
+                logger.info("[TTS] Reusing voice cloned from identical audio. Voice ID: %s", cached_voice_id)
+                await self._remember_clone(cache_key, cached_voice_id)
+                return cached_voice_id
             
             files = {
-                "files": ("audio.wav", audio_data, "audio/wav")
+                "files": (filename, audio_data, mimetype)
             }
             data = {
                 "name": voice_name,
                 "description": "Voice cloned from original video"
             }
             
-            print("[TTS] Sending voice cloning request to ElevenLabs...")
-            async with httpx.AsyncClient() as client:
-                try:
-                    response = await client.post(
-                        f"{self.base_url}/voices/add",
-                        headers=headers,
+            logger.info("[TTS] Sending voice cloning request to ElevenLabs...")
+            try:
+                async with _ELEVENLABS_VOICES_SEMAPHORE:
+                    response = await self._client.post(
+                        "/voices/add",
                         files=files,
-                        data=data,
-                        timeout=REQUEST_TIMEOUT
+                        data=data
                     )
-                    
-                    print(f"[TTS] Voice cloning response status: {response.status_code}")
-                    
-                    if response.status_code == 200:
-                        result = response.json()
-                        voice_id = result.get("voice_id")
-                        if not voice_id:
-                            raise HTTPException(
-                                status_code=500,
-                                detail="Voice cloning succeeded but no voice_id in response"
-                            )
-                        print(f"[TTS] Voice cloning successful. Voice ID: {voice_id}")
-                        return voice_id
-                    else:
-                        # Try to get detailed error message
-                        error_detail = "Unknown error"
-                        try:
-                            error_json = response.json()
-                            error_detail = error_json.get("detail", error_json)
-                        except:
-                            error_detail = response.text or "No error details available"
-                        
-                        print(f"[TTS] Voice cloning failed with status {response.status_code}")
-                        print(f"[TTS] Error details: {error_detail}")
-                        
+                
+                logger.debug("[TTS] Voice cloning response status: %d", response.status_code)
+                
+                if response.status_code == 200:
+                    result = orjson.loads(response.content)
+                    voice_id = result.get("voice_id")
+                    if not voice_id:
                         raise HTTPException(
-                            status_code=response.status_code,
-                            detail=f"Voice cloning failed: {error_detail}"
+                            status_code=500,
+                            detail="Voice cloning succeeded but no voice_id in response"
                         )
-                except httpx.ReadTimeout:
-                    print("[TTS] Voice cloning request timed out")
-                    raise HTTPException(status_code=504, detail="Voice cloning request timed out")
-                except httpx.ConnectTimeout:
-                    print("[TTS] Could not connect to ElevenLabs API")
-                    raise HTTPException(status_code=504, detail="Could not connect to voice service")
-                except Exception as e:
-                    print(f"[TTS] Request error: {type(e).__name__}: {str(e)}")
-                    raise HTTPException(status_code=500, detail=f"Voice cloning request failed: {str(e)}")
-                        
+                    logger.info("[TTS] Voice cloning successful. Voice ID: %s", voice_id)
+                    await self._remember_clone(cache_key, voice_id)
+                    return voice_id
+                else:
+                    # Try to get detailed error message
+                    error_detail = "Unknown error"
+                    try:
+                        error_json = response.json()
+                        error_detail = error_json.get("detail", error_json)
+                    except:
+                        error_detail = response.text or "No error details available"
+                    
+                    logger.error("[TTS] Voice cloning failed with status %d", response.status_code)
+                    logger.error("[TTS] Error details: %s", error_detail)
+                    
+                    raise HTTPException(
+                        status_code=response.status_code,
+                        detail=f"Voice cloning failed: {error_detail}"
+                    )
+            except httpx.ReadTimeout:
+                logger.error("[TTS] Voice cloning request timed out")
+                raise HTTPException(status_code=504, detail="Voice cloning request timed out")
+            except httpx.ConnectTimeout:
+                logger.error("[TTS] Could not connect to ElevenLabs API")
+                raise HTTPException(status_code=504, detail="Could not connect to voice service")
+            except Exception as e:
+                logger.error("[TTS] Request error: %s: %s", type(e).__name__, e)
+                raise HTTPException(status_code=500, detail=f"Voice cloning request failed: {str(e)}")
+                    
         except HTTPException as he:
             # Re-raise HTTP exceptions with their original status and detail
             raise he
         except Exception as e:
-            print(f"[TTS] Unexpected error during voice cloning: {type(e).__name__}: {str(e)}")
-            print(f"[TTS] Audio file path: {audio_file_path}")
-            print(f"[TTS] Audio file exists: {os.path.exists(audio_file_path)}")
-            if os.path.exists(audio_file_path):
-                print(f"[TTS] Audio file size: {os.path.getsize(audio_file_path)} bytes")
+            logger.exception("[TTS] Unexpected error during voice cloning (%d bytes of reference audio)", len(audio_data))
             raise HTTPException(status_code=500, detail=f"Voice cloning failed: {str(e)}")
     
+    def _synthesis_payload(self, text: str, voice_settings: Optional[Mapping[str, Any]]) -> Dict[str, Any]:
+        """Build the text-to-speech request body, applying voice_settings over the defaults"""
+        # Complete settings (the defaults and every preset) go in as-is, still
+        # read-only; only partial overrides need merging over the defaults
+        settings = voice_settings or DEFAULT_VOICE_SETTINGS
+        if not settings.keys() >= DEFAULT_VOICE_SETTINGS.keys():
+            settings = {**DEFAULT_VOICE_SETTINGS, **settings}
+        return {
+            "text": text,
+            "model_id": "eleven_multilingual_v2",
+            "voice_settings": settings
+        }
+    
+    def _synthesis_cache_path(self, text: str, voice_id: str, voice_settings: Optional[Mapping[str, Any]]) -> str:
+        """On-disk cache location for a synthesis, keyed by everything that shapes the audio"""
+        normalized = unicodedata.normalize("NFC", text.strip())
+        key_source = json.dumps(
+            {"voice_id": voice_id, "params": SYNTHESIS_PARAMS, **self._synthesis_payload(normalized, voice_settings)},
+            sort_keys=True,
+            default=dict  # Read-only settings mappings serialize like the dicts they wrap
+        )
+        key = hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+        return os.path.join(config.SYNTH_CACHE_DIR, key[:2], f"{key}.{AUDIO_FORMAT}")
+    
+    @staticmethod
+    def _is_cached(cache_path: str) -> bool:
+        """Whether a non-empty cached synthesis exists, marking it recently used if so"""
+        try:
+            if os.stat(cache_path).st_size == 0:
+                return False
+            # mtime doubles as last-use time for _sweep_synthesis_cache
+            os.utime(cache_path)
+            return True
+        except OSError:
+            return False
+    
+    @staticmethod
+    def _sweep_synthesis_cache() -> int:
+        """Delete cached syntheses (and stray temp files) unused for SYNTH_CACHE_MAX_AGE_HOURS"""
+        cutoff = time.time() - config.SYNTH_CACHE_MAX_AGE_HOURS * 3600
+        removed = 0
+        for dir_path, _, file_names in os.walk(config.SYNTH_CACHE_DIR):
+            for file_name in file_names:
+                file_path = os.path.join(dir_path, file_name)
+                try:
+                    if os.stat(file_path).st_mtime < cutoff:
+                        os.remove(file_path)
+                        removed += 1
+                except OSError:
+                    pass  # Already removed, e.g. by another worker's sweep
+        return removed
+    
+    async def _run_synthesis_cache_sweep(self):
+        """Sweep the synthesis cache in a worker thread, logging what was freed"""
+        try:
+            removed = await asyncio.to_thread(self._sweep_synthesis_cache)
+            if removed:
+                logger.info("[TTS] Removed %d expired synthesis cache files", removed)
+        except Exception as sweep_error:
+            logger.warning("[TTS] Synthesis cache sweep failed: %s", sweep_error)
+    
+    def _schedule_synthesis_cache_sweep(self):
+        """Start a background cache sweep if SYNTH_CACHE_SWEEP_INTERVAL has passed since the last"""
+        now = time.monotonic()
+        if self._synth_cache_swept_at and now - self._synth_cache_swept_at < SYNTH_CACHE_SWEEP_INTERVAL:
+            return
+        if self._synth_cache_sweep and not self._synth_cache_sweep.done():
+            return
+        self._synth_cache_swept_at = now
+        self._synth_cache_sweep = asyncio.create_task(self._run_synthesis_cache_sweep())
+    
+    @staticmethod
+    def _store_in_cache(cache_path: str, source_path: Optional[str] = None, data: Optional[bytes] = None):
+        """Write a synthesis into the cache atomically, from a file or from bytes"""
+        cache_dir = os.path.dirname(cache_path)
+        os.makedirs(cache_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=cache_dir, suffix=".tmp", delete=False) as tmp_file:
+            if source_path:
+                with open(source_path, 'rb') as source:
+                    shutil.copyfileobj(source, tmp_file)
+            else:
+                tmp_file.write(data)
+        os.replace(tmp_file.name, cache_path)
+    
+    @_retry_transient
     async def synthesize_speech(
         self, 
         text: str, 
         voice_id: str,
-        voice_settings: Optional[Dict[str, float]] = None
-    ) -> bytes:
+        voice_settings: Optional[Mapping[str, Any]] = None,
+        dest_path: Optional[str] = None
+    ) -> Union[bytes, str]:
         """
         Convert text to speech using specified voice
         
@@ -166,56 +551,100 @@ class ElevenLabsTTS:
             text: Text to convert to speech
             voice_id: ElevenLabs voice ID
             voice_settings: Voice configuration (stability, similarity_boost, speed, etc.)
+            dest_path: When given, the audio is streamed to this file as it arrives
+                instead of being buffered in memory
             
         Returns:
-            Audio data as bytes
+            dest_path if given, otherwise the audio data as bytes
         """
-        try:
-            headers = {
-                "Accept": "audio/mpeg",
-                "Content-Type": "application/json",
-                "xi-api-key": self.api_key
-            }
-            
-            # Default voice settings
-            default_settings = {
-                "stability": 0.5,
-                "similarity_boost": 0.8,
-                "style": 0.0,
-                "use_speaker_boost": True
-            }
+        cache_path = self._synthesis_cache_path(text, voice_id, voice_settings)
+        while True:
+            if await asyncio.to_thread(self._is_cached, cache_path):
+                if dest_path:
+                    await asyncio.to_thread(shutil.copyfile, cache_path, dest_path)
+                    return dest_path
+                async with aiofiles.open(cache_path, 'rb') as cached:
+                    return await cached.read()
             
-            if voice_settings:
-                default_settings.update(voice_settings)
-            
-            payload = {
-                "text": text,
-                "model_id": "eleven_multilingual_v2",
-                "voice_settings": default_settings
-            }
+            # Identical request already in flight: wait for it to land in the cache.
+            # If it failed (or couldn't be cached) the loop falls through and fetches.
+            pending = self._inflight_synthesis.get(cache_path)
+            if pending is None:
+                break
+            await pending.wait()
+        
+        finished = asyncio.Event()
+        self._inflight_synthesis[cache_path] = finished
+        try:
+            return await self._fetch_synthesis(text, voice_id, voice_settings, dest_path, cache_path)
+        finally:
+            del self._inflight_synthesis[cache_path]
+            finished.set()
+    
+    async def _fetch_synthesis(
+        self,
+        text: str,
+        voice_id: str,
+        voice_settings: Optional[Mapping[str, Any]],
+        dest_path: Optional[str],
+        cache_path: str
+    ) -> Union[bytes, str]:
+        """Request speech from ElevenLabs and store it in the synthesis cache"""
+        try:
+            async with _ELEVENLABS_SEMAPHORE:
+                async with self._client.stream(
+                    "POST",
+                    f"/text-to-speech/{voice_id}",
+                    params=SYNTHESIS_PARAMS,
+                    headers={"Accept": "audio/mpeg", "Content-Type": "application/json"},
+                    content=orjson.dumps(self._synthesis_payload(text, voice_settings), default=dict)
+                ) as response:
+                    if response.status_code != 200:
+                        await response.aread()
+                        if response.status_code == 404 or "voice_not_found" in response.text:
+                            raise VoiceNotFoundError(voice_id)
+                        error_type = (
+                            TransientSynthesisError
+                            if response.status_code in RETRYABLE_STATUS_CODES
+                            else HTTPException
+                        )
+                        raise error_type(
+                            status_code=response.status_code,
+                            detail=f"Speech synthesis failed: {response.text}"
+                        )
+                    
+                    if dest_path:
+                        async with aiofiles.open(dest_path, 'wb') as f:
+                            async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+                                await f.write(chunk)
+                    else:
+                        audio_data = await response.aread()
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/text-to-speech/{voice_id}",
-                    headers=headers,
-                    json=payload,
-                    timeout=REQUEST_TIMEOUT
-                )
-                
-                if response.status_code == 200:
-                    return response.content
+            try:
+                if dest_path:
+                    await asyncio.to_thread(self._store_in_cache, cache_path, source_path=dest_path)
                 else:
-                    raise HTTPException(
-                        status_code=response.status_code,
-                        detail=f"Speech synthesis failed: {response.text}"
-                    )
+                    await asyncio.to_thread(self._store_in_cache, cache_path, data=audio_data)
+            except OSError as cache_error:
+                logger.warning("[TTS] Could not cache synthesized audio: %s", cache_error)
+            self._schedule_synthesis_cache_sweep()
+            return dest_path or audio_data
                     
-        except Exception as e:
-            # Handle timeout and connection errors
-            if "timeout" in str(e).lower() or "timed out" in str(e).lower():
-                raise HTTPException(status_code=504, detail="Speech synthesis request timed out")
-            else:
-                raise HTTPException(status_code=500, detail=f"Speech synthesis failed: {str(e)}")
+        except BaseException as e:
+            # Don't leave a truncated file behind for the combine step to pick up,
+            # including when the caller cancels mid-stream
+            if dest_path:
+                try:
+                    await asyncio.to_thread(os.remove, dest_path)
+                except FileNotFoundError:
+                    pass
+            if isinstance(e, HTTPException) or not isinstance(e, Exception):
+                raise
+            if isinstance(e, httpx.TimeoutException):
+                raise TransientSynthesisError(status_code=504, detail="Speech synthesis request timed out")
+            if isinstance(e, httpx.TransportError):
+                raise TransientSynthesisError(status_code=502, detail=f"Could not reach ElevenLabs: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Speech synthesis failed: {str(e)}")
 
 
 class TTSService:
@@ -229,9 +658,55 @@ class TTSService:
                 detail="ELEVENLABS_API_KEY not found in environment variables"
             )
         self.elevenlabs = ElevenLabsTTS(api_key)
+        # (organized_at, options) for the /voices endpoint, warm-started from disk
+        self._voice_options_cache: Optional[tuple[float, Dict[str, Any]]] = self._load_voice_options()
+    
+    async def aclose(self):
+        """Release pooled ElevenLabs connections"""
+        await self.elevenlabs.aclose()
+    
+    async def _ensure_temp_dir(self, session_id: Optional[str]) -> str:
+        """
+        Get the temp directory for a session
+        
+        The dubbing pipeline has already created it during transcription; the
+        makedirs only matters when the service is used on its own. Calls without
+        a session get a fresh private directory, since their fixed output names
+        would otherwise collide.
+        """
+        if not session_id:
+            return await asyncio.to_thread(tempfile.mkdtemp)
+        
+        temp_dir = config.get_temp_dir(session_id)
+        await asyncio.to_thread(os.makedirs, temp_dir, exist_ok=True)
+        return temp_dir
+    
+    def _load_voice_options(self) -> Optional[tuple[float, Dict[str, Any]]]:
+        """Load voice options persisted by an earlier process, if still within VOICES_CACHE_TTL"""
+        try:
+            age = time.time() - os.path.getmtime(config.VOICE_CACHE_PATH)
+            if age >= VOICES_CACHE_TTL:
+                return None
+            with open(config.VOICE_CACHE_PATH, 'r') as cache_file:
+                # Back-date the monotonic timestamp so the TTL counts from the fetch
+                return time.monotonic() - age, json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+    
+    def _save_voice_options(self, organized_voices: Dict[str, Any]):
+        """Persist voice options atomically so restarts and other workers skip the fetch"""
+        os.makedirs(os.path.dirname(config.VOICE_CACHE_PATH), exist_ok=True)
+        tmp_path = f"{config.VOICE_CACHE_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as cache_file:
+            json.dump(organized_voices, cache_file)
+        os.replace(tmp_path, config.VOICE_CACHE_PATH)
     
     async def get_voice_options(self) -> Dict[str, Any]:
-        """Get available voice options for the frontend"""
+        """Get available voice options for the frontend (cached for VOICES_CACHE_TTL seconds)"""
+        cached = self._voice_options_cache
+        if cached and time.monotonic() - cached[0] < VOICES_CACHE_TTL:
+            return cached[1]
+        
         try:
             voices = await self.elevenlabs.get_available_voices()
             
@@ -258,6 +733,11 @@ class TTSService:
                         "age": voice.get("labels", {}).get("age", "")
                     })
             
+            self._voice_options_cache = (time.monotonic(), organized_voices)
+            try:
+                await asyncio.to_thread(self._save_voice_options, organized_voices)
+            except OSError as cache_error:
+                logger.warning("[TTS] Could not persist voice options: %s", cache_error)
             return organized_voices
             
         except Exception as e:
@@ -281,13 +761,102 @@ class TTSService:
                 ]
             }
     
+    async def _can_clone(self, audio_file_path: Optional[str]) -> bool:
+        """Cheap local check that reference audio is long enough to clone from"""
+        import ffmpeg
+        
+        if not audio_file_path:
+            return False
+        
+        try:
+            if (await asyncio.to_thread(os.stat, audio_file_path)).st_size < MIN_CLONE_AUDIO_BYTES:
+                return False
+            probe = await asyncio.to_thread(ffmpeg.probe, audio_file_path)
+            return float(probe['format']['duration']) >= MIN_CLONE_AUDIO_SECONDS
+        except FileNotFoundError:
+            return False
+        except Exception:
+            # Unprobeable audio: let the clone request decide
+            return True
+    
+    async def resolve_voice(
+        self,
+        voice_option: str,
+        original_audio_path: Optional[str],
+        target_language: str = "en",
+        session_id: str = None,
+        reference_audio: Optional[bytes] = None
+    ) -> tuple[str, Mapping[str, Any]]:
+        """
+        Resolve the voice ID and settings to dub with
+        
+        Clones the original speaker when voice_option is "clone", falling back to a
+        prebuilt voice suited to the target language if cloning fails.
+        
+        Args:
+            voice_option: Voice ID or "clone" for voice cloning
+            original_audio_path: Path to original audio for voice cloning
+            target_language: Target language code, used to pick a fallback voice
+            session_id: Session ID for logging
+            reference_audio: In-memory WAV to clone from instead of original_audio_path
+                (see VideoProcessor.extract_audio_bytes)
+            
+        Returns:
+            Tuple of (voice_id, voice_settings)
+        """
+        try:
+            if voice_option == "clone":
+                if reference_audio:
+                    logger.info("[TTS %s] Attempting to clone voice from %d bytes of reference audio", session_id, len(reference_audio))
+                    voice_id = await self.elevenlabs.clone_voice_from_audio_bytes(
+                        reference_audio,
+                        DEFAULT_VOICE_NAME
+                    )
+                else:
+                    # Go straight to the fallback voice rather than upload audio that can't be cloned
+                    if not await self._can_clone(original_audio_path):
+                        raise ValueError("reference audio is missing or too short to clone")
+                    
+                    logger.info("[TTS %s] Attempting to clone voice from %s", session_id, original_audio_path)
+                    voice_id = await self.elevenlabs.clone_voice_from_audio(
+                        original_audio_path,
+                        DEFAULT_VOICE_NAME
+                    )
+                logger.info("[TTS %s] Voice cloning successful, got voice ID: %s", session_id, voice_id)
+                
+                # Use stronger similarity settings for cloned voice
+                voice_settings = CLONED_VOICE_SETTINGS
+            else:
+                logger.info("[TTS %s] Using pre-built voice: %s", session_id, voice_option)
+                voice_id = voice_option
+                # Use default voice settings from VOICE_PRESETS
+                voice_settings = VOICE_PRESETS["natural"]
+        except Exception as e:
+            logger.warning("[TTS %s] Voice cloning failed: %s", session_id, e)
+            logger.warning("[TTS %s] Falling back to default voice", session_id)
+            
+            # Select fallback voice based on target language
+            if target_language == "hi":  # Hindi
+                voice_id = "pNInz6obpgDQGcFmaJgB"  # Adam - better for Indian languages
+                logger.info("[TTS %s] Using Hindi-friendly fallback voice: %s", session_id, voice_id)
+            elif target_language in ["es", "pt"]:  # Spanish/Portuguese  
+                voice_id = "TxGEqnHWrfWFTfGW9XjX"  # Josh - good for Spanish
+                logger.info("[TTS %s] Using Spanish/Portuguese fallback voice: %s", session_id, voice_id)
+            else:
+                voice_id = "21m00Tcm4TlvDq8ikWAM"  # Default English voice
+                logger.info("[TTS %s] Using default English fallback voice: %s", session_id, voice_id)
+            
+            voice_settings = VOICE_PRESETS["natural"]
+            logger.info("[TTS %s] Using natural voice settings for fallback", session_id)
+        
+        return voice_id, voice_settings
+
     async def create_dubbed_audio(
         self,
         transcription_data: Dict[str, Any],
         translated_text: str,
-        original_audio_path: str,
-        voice_option: str = "clone",
-        voice_settings: Optional[Dict[str, float]] = None,
+        voice_id: str,
+        voice_settings: Optional[Mapping[str, Any]] = None,
         session_id: str = None
     ) -> str:
         """
@@ -296,232 +865,275 @@ class TTSService:
         Args:
             transcription_data: Timing data from Deepgram
             translated_text: Translated text
-            original_audio_path: Path to original audio for voice cloning
-            voice_option: Voice ID or "clone" for voice cloning
+            voice_id: ElevenLabs voice ID (see resolve_voice)
             voice_settings: Custom voice settings
             
         Returns:
             Path to generated dubbed audio file
         """
         try:
-            # Determine voice ID
-            if voice_option == "clone":
-                # Clone voice from original audio
-                voice_id = await self.elevenlabs.clone_voice_from_audio(
-                    original_audio_path,
-                    "temp_cloned_voice"
+            import ffmpeg
+            from translate import split_text_chunks
+            
+            temp_dir = await self._ensure_temp_dir(session_id)
+            logger.debug("[TTS %s] Using temp dir: %s", session_id, temp_dir)
+            dubbed_audio_path = os.path.join(temp_dir, "dubbed_audio.mp3")
+            
+            # Synthesize sentence-aligned segments in parallel instead of one long request
+            segments = split_text_chunks(translated_text, max_chars=FULL_TEXT_SEGMENT_CHARS)
+            if len(segments) <= 1:
+                return await self.elevenlabs.synthesize_speech(
+                    translated_text,
+                    voice_id,
+                    voice_settings,
+                    dest_path=dubbed_audio_path
                 )
-            else:
-                # Use pre-built voice
-                voice_id = voice_option
             
-            # Generate speech
-            audio_data = await self.elevenlabs.synthesize_speech(
-                translated_text,
-                voice_id,
-                voice_settings
-            )
+            semaphore = asyncio.Semaphore(SYNTHESIS_CONCURRENCY)
             
-            # Save to temporary file
-            if session_id:
-                temp_dir = config.get_temp_dir(session_id)
-                os.makedirs(temp_dir, exist_ok=True)
-                print(f"[TTS {session_id}] Using temp dir: {temp_dir}")
-            else:
-                temp_dir = tempfile.mkdtemp()
-                print(f"[TTS] Using temp dir: {temp_dir}")
-                
-            dubbed_audio_path = os.path.join(temp_dir, "dubbed_audio.mp3")
+            async def synthesize_segment(index: int, segment: str) -> str:
+                async with semaphore:
+                    return await self.elevenlabs.synthesize_speech(
+                        segment,
+                        voice_id,
+                        voice_settings,
+                        dest_path=os.path.join(temp_dir, f"dubbed_{index:03d}.{AUDIO_FORMAT}")
+                    )
             
-            with open(dubbed_audio_path, 'wb') as f:
-                f.write(audio_data)
+            logger.info("[TTS %s] Synthesizing %d text segments", session_id, len(segments))
+            segment_paths = await asyncio.gather(*(
+                synthesize_segment(index, segment) for index, segment in enumerate(segments)
+            ))
+            
+            # Segments share the pinned output format, so they join without re-encoding
+            timeline = [("utterance", path) for path in segment_paths]
+            try:
+                await asyncio.to_thread(self._concat_demuxer, timeline, temp_dir, dubbed_audio_path, "copy")
+            except ffmpeg.Error as e:
+                error_msg = e.stderr.decode() if e.stderr else str(e)
+                logger.warning("[TTS %s] Stream copy failed, re-encoding instead: %s", session_id, error_msg)
+                await asyncio.to_thread(self._concat_reencode, timeline, dubbed_audio_path, "libmp3lame")
             
             return dubbed_audio_path
             
+        except VoiceNotFoundError:
+            raise
         except Exception as e:
-            print(f"TTS Error in create_dubbed_audio: {type(e).__name__}: {str(e)}")
-            print(f"Voice option: {voice_option}")
-            print(f"Audio path exists: {os.path.exists(original_audio_path) if original_audio_path else 'None'}")
-            print(f"Translated text length: {len(translated_text)}")
+            logger.error("TTS Error in create_dubbed_audio: %s: %s", type(e).__name__, e)
+            logger.error("Voice ID: %s", voice_id)
+            logger.error("Translated text length: %d", len(translated_text))
             raise HTTPException(status_code=500, detail=f"Audio dubbing failed: {str(e)}")
 
+    def build_utterances(self, transcription_data: Dict[str, Any], session_id: str = None) -> List[Dict[str, Any]]:
+        """
+        Timed segments to dub, each with start, end and transcript
+        
+        Uses Deepgram's utterances, else its paragraphs, else sentences of the full
+        text with estimated timing. Empty when there is no text to dub at all.
+        """
+        # Get utterances with timing
+        utterances = transcription_data.get("utterances", [])
+        if utterances:
+            return utterances
+        
+        logger.info("[TTS %s] No utterances found, trying paragraphs as fallback...", session_id)
+        utterances = []
+        
+        # Try using paragraphs as utterances
+        paragraphs = transcription_data.get("paragraphs", [])
+        if paragraphs:
+            logger.info("[TTS %s] Found %d paragraphs, using as utterances", session_id, len(paragraphs))
+            for para in paragraphs:
+                if isinstance(para, dict) and para.get("text"):
+                    utterances.append({
+                        "start": para.get("start", 0),
+                        "end": para.get("end", 0),
+                        "transcript": para.get("text", "")
+                    })
+        
+        # If still no utterances, create synthetic ones from the full text
+        if not utterances:
+            logger.info("[TTS %s] No paragraphs found, creating synthetic utterances from sentences", session_id)
+            sentences = _SENTENCE_SPLIT.split(transcription_data.get("text", ""))
+            sentences = [s.strip() for s in sentences if s.strip()]
+            
+            if sentences:
+                # Create fake timing (distribute evenly across estimated duration)
+                total_words = len(transcription_data.get("words", []))
+                estimated_duration = total_words * 0.5 if total_words else 30  # 0.5 seconds per word estimate
+                time_per_sentence = estimated_duration / len(sentences)
+                
+                for i, sentence in enumerate(sentences):
+                    start_time = i * time_per_sentence
+                    end_time = (i + 1) * time_per_sentence
+                    utterances.append({
+                        "start": start_time,
+                        "end": end_time,
+                        "transcript": sentence
+                    })
+                
+                logger.info("[TTS %s] Created %d synthetic utterances", session_id, len(utterances))
+        
+        return utterances
+    
+    async def translate_utterances(
+        self,
+        utterances: List[Dict[str, Any]],
+        target_language: str,
+        session_id: str = None
+    ) -> List[str]:
+        """
+        Translate utterance transcripts, in order
+        
+        translate_segments joins them into as few requests as the size limit
+        allows. Translation failures fall back to the original text; an
+        unsupported target language is still raised.
+        """
+        from translate import translate_segments
+        
+        originals = [utterance.get("transcript", "") for utterance in utterances]
+        if not originals:
+            return []
+        
+        try:
+            logger.info("[TTS %s] Translating %d utterances", session_id, len(originals))
+            return await translate_segments(originals, target_language)
+        except Exception as translate_error:
+            if isinstance(translate_error, HTTPException) and translate_error.status_code == 400:
+                raise
+            logger.warning("[TTS %s] Utterance translation failed: %s", session_id, translate_error)
+            return originals  # Fallback to original
+    
     async def create_synchronized_dubbed_audio(
         self,
         transcription_data: Dict[str, Any],
-        translated_text: str,
-        original_audio_path: str,
-        voice_option: str = "clone",
-        voice_settings: Optional[Dict[str, float]] = None,
+        voice_id: str,
+        voice_settings: Optional[Mapping[str, Any]] = None,
         session_id: str = None,
-        target_language: str = "en"
+        target_language: str = "en",
+        utterances: Optional[List[Dict[str, Any]]] = None,
+        translations: Optional[List[str]] = None
     ) -> str:
         """
         Create dubbed audio with utterance-level synchronization to preserve timing and pauses
         
         Args:
             transcription_data: Timing data from Deepgram with utterances
-            translated_text: Full translated text
-            original_audio_path: Path to original audio for voice cloning
-            voice_option: Voice ID or "clone" for voice cloning
+            voice_id: ElevenLabs voice ID (see resolve_voice)
             voice_settings: Custom voice settings
             session_id: Session ID for temp directory
+            target_language: Language code each utterance is translated to
+            utterances: Segments from build_utterances, built here when omitted
+            translations: translate_utterances result for utterances, so callers
+                can translate while the voice is being resolved; translated here
+                when omitted
             
         Returns:
             Path to generated synchronized dubbed audio file
         """
         try:
-            print(f"[TTS {session_id}] Starting synchronized dubbing...")
+            logger.info("[TTS %s] Starting synchronized dubbing with voice %s...", session_id, voice_id)
             
-            # Determine voice ID
-            try:
-                if voice_option == "clone":
-                    print(f"[TTS {session_id}] Attempting to clone voice from {original_audio_path}")
-                    voice_id = await self.elevenlabs.clone_voice_from_audio(
-                        original_audio_path,
-                        DEFAULT_VOICE_NAME
-                    )
-                    print(f"[TTS {session_id}] Voice cloning successful, got voice ID: {voice_id}")
-                    
-                    # Use stronger similarity settings for cloned voice
-                    voice_settings = {
-                        "stability": 0.3,  # Lower stability for more expressive speech
-                        "similarity_boost": 0.95,  # Higher similarity to match original voice
-                        "style": 0.0,  # Neutral style
-                        "use_speaker_boost": True
-                    }
-                else:
-                    print(f"[TTS {session_id}] Using pre-built voice: {voice_option}")
-                    voice_id = voice_option
-                    # Use default voice settings from VOICE_PRESETS
-                    voice_settings = VOICE_PRESETS.get("natural", {})
-            except Exception as e:
-                print(f"[TTS {session_id}] Voice cloning failed: {str(e)}")
-                print(f"[TTS {session_id}] Falling back to default voice")
-                
-                # Select fallback voice based on target language
-                if target_language == "hi":  # Hindi
-                    voice_id = "pNInz6obpgDQGcFmaJgB"  # Adam - better for Indian languages
-                    print(f"[TTS {session_id}] Using Hindi-friendly fallback voice: {voice_id}")
-                elif target_language in ["es", "pt"]:  # Spanish/Portuguese  
-                    voice_id = "TxGEqnHWrfWFTfGW9XjX"  # Josh - good for Spanish
-                    print(f"[TTS {session_id}] Using Spanish/Portuguese fallback voice: {voice_id}")
-                else:
-                    voice_id = "21m00Tcm4TlvDq8ikWAM"  # Default English voice
-                    print(f"[TTS {session_id}] Using default English fallback voice: {voice_id}")
-                
-                voice_settings = VOICE_PRESETS.get("natural", {})
-                print(f"[TTS {session_id}] Using natural voice settings for fallback")
+            if utterances is None:
+                utterances = self.build_utterances(transcription_data, session_id)
             
-            # Get utterances with timing
-            utterances = transcription_data.get("utterances", [])
+            # Final fallback to full text, translated only now that it's needed
             if not utterances:
-                print(f"[TTS {session_id}] No utterances found, trying paragraphs as fallback...")
-                
-                # Try using paragraphs as utterances
-                paragraphs = transcription_data.get("paragraphs", [])
-                if paragraphs:
-                    print(f"[TTS {session_id}] Found {len(paragraphs)} paragraphs, using as utterances")
-                    utterances = []
-                    for para in paragraphs:
-                        if isinstance(para, dict) and para.get("text"):
-                            utterances.append({
-                                "start": para.get("start", 0),
-                                "end": para.get("end", 0),
-                                "transcript": para.get("text", "")
-                            })
+                from translate import translate_transcription
                 
-                # If still no utterances, create synthetic ones from the full text
-                if not utterances:
-                    print(f"[TTS {session_id}] No paragraphs found, creating synthetic utterances from sentences")
-                    import re
-                    sentences = re.split(r'[.!?]+', transcription_data.get("text", ""))
-                    sentences = [s.strip() for s in sentences if s.strip()]
-                    
-                    if sentences:
-                        # Create fake timing (distribute evenly across estimated duration)
-                        total_words = len(transcription_data.get("words", []))
-                        estimated_duration = total_words * 0.5 if total_words else 30  # 0.5 seconds per word estimate
-                        time_per_sentence = estimated_duration / len(sentences)
-                        
-                        for i, sentence in enumerate(sentences):
-                            start_time = i * time_per_sentence
-                            end_time = (i + 1) * time_per_sentence
-                            utterances.append({
-                                "start": start_time,
-                                "end": end_time,
-                                "transcript": sentence
-                            })
-                        
-                        print(f"[TTS {session_id}] Created {len(utterances)} synthetic utterances")
-                
-                # Final fallback to full text
-                if not utterances:
-                    print(f"[TTS {session_id}] No utterances possible, falling back to full text")
-                    return await self.create_dubbed_audio(
-                        transcription_data, translated_text, original_audio_path, 
-                        voice_option, voice_settings, session_id
-                    )
+                logger.warning("[TTS %s] No utterances possible, falling back to full text", session_id)
+                translated_text = await translate_transcription(transcription_data.get("text", ""), target_language)
+                return await self.create_dubbed_audio(
+                    transcription_data, translated_text, voice_id,
+                    voice_settings, session_id
+                )
+            
+            if translations is None:
+                translations = await self.translate_utterances(utterances, target_language, session_id)
             
-            print(f"[TTS {session_id}] Processing {len(utterances)} utterances...")
+            logger.info("[TTS %s] Processing %d utterances...", session_id, len(utterances))
             
-            # Import translation function
-            from translate import translate_transcription
+            temp_dir = await self._ensure_temp_dir(session_id)
             
-            # Generate TTS for each utterance (translate individually for better accuracy)
-            utterance_audio_files = []
-            temp_dir = config.get_temp_dir(session_id) if session_id else tempfile.mkdtemp()
+            # Per-utterance synthesis runs concurrently, bounded by a semaphore
+            semaphore = asyncio.Semaphore(SYNTHESIS_CONCURRENCY)
+            # Voice and settings are fixed for the session, so identical text gives
+            # identical audio: repeated phrases share one synthesis and one file
+            synthesized: Dict[str, asyncio.Future] = {}
             
-            for i, utterance in enumerate(utterances):
+            async def synthesize_once(text: str, utterance_file: str) -> str:
+                async with semaphore:
+                    return await self.elevenlabs.synthesize_speech(
+                        text,
+                        voice_id,
+                        voice_settings,
+                        dest_path=utterance_file
+                    )
+            
+            async def process_utterance(i: int, utterance: Dict[str, Any], utterance_translated: str) -> Optional[Dict[str, Any]]:
                 start_time = utterance.get("start", 0)
                 end_time = utterance.get("end", 0)
                 original_text = utterance.get("transcript", "")
                 
-                # Translate each utterance individually for better accuracy
-                try:
-                    print(f"[TTS {session_id}] Translating utterance {i+1}: '{original_text[:50]}...'")
-                    utterance_translated = await translate_transcription(original_text, target_language)
-                    print(f"[TTS {session_id}] Translation result: '{utterance_translated[:50]}...'")
-                except Exception as translate_error:
-                    print(f"[TTS {session_id}] Translation failed for utterance {i+1}: {str(translate_error)}")
-                    utterance_translated = original_text  # Fallback to original
+                logger.debug("[TTS %s] Utterance %d: %.2fs-%.2fs", session_id, i+1, start_time, end_time)
+                logger.debug("[TTS %s] Original: '%s...'", session_id, original_text[:50])
+                logger.debug("[TTS %s] Translated: '%s...'", session_id, utterance_translated[:50])
                 
-                print(f"[TTS {session_id}] Utterance {i+1}: {start_time:.2f}s-{end_time:.2f}s")
-                print(f"[TTS {session_id}] Original: '{original_text[:50]}...'")
-                print(f"[TTS {session_id}] Translated: '{utterance_translated[:50]}...'")
+                if not utterance_translated.strip():
+                    return None
                 
-                # Generate TTS for this utterance
-                if utterance_translated.strip():
-                    audio_data = await self.elevenlabs.synthesize_speech(
-                        utterance_translated,
-                        voice_id,
-                        voice_settings
-                    )
-                    
-                    # Save utterance audio
+                # Generate TTS for this utterance, streamed straight into its file
+                text_key = utterance_translated.strip()
+                synthesis = synthesized.get(text_key)
+                if synthesis is None:
                     utterance_file = os.path.join(temp_dir, f"utterance_{i}.{AUDIO_FORMAT}")
-                    with open(utterance_file, 'wb') as f:
-                        f.write(audio_data)
-                    
-                    utterance_audio_files.append({
-                        'file': utterance_file,
-                        'start': start_time,
-                        'end': end_time,
-                        'duration': end_time - start_time
-                    })
+                    synthesis = asyncio.ensure_future(synthesize_once(utterance_translated, utterance_file))
+                    synthesized[text_key] = synthesis
+                else:
+                    logger.debug("[TTS %s] Utterance %d repeats earlier text, reusing its audio", session_id, i+1)
+                utterance_file = await synthesis
+                
+                return {
+                    'file': utterance_file,
+                    'start': start_time,
+                    'end': end_time,
+                    'duration': end_time - start_time
+                }
+            
+            tasks = [
+                asyncio.ensure_future(process_utterance(i, utterance, translated))
+                for i, (utterance, translated) in enumerate(zip(utterances, translations))
+            ]
+            try:
+                results = await asyncio.gather(*tasks)
+            except BaseException:
+                # gather leaves the other utterances running: cancel them so they stop
+                # billing ElevenLabs, and wait so their cleanup can't remove files a
+                # retry (e.g. after re-cloning the voice) has already written
+                pending = [task for task in (*tasks, *synthesized.values()) if not task.done()]
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                raise
+            
+            # Keep utterances in timeline order for _combine_utterances_with_timing
+            utterance_audio_files = [result for result in results if result]
+            utterance_audio_files.sort(key=lambda x: x['start'])
             
             # Combine utterances with proper timing using FFmpeg
             final_audio_path = await self._combine_utterances_with_timing(
                 utterance_audio_files, temp_dir, session_id
             )
             
-            print(f"[TTS {session_id}] Synchronized dubbing completed: {final_audio_path}")
+            logger.info("[TTS %s] Synchronized dubbing completed: %s", session_id, final_audio_path)
             return final_audio_path
             
+        except VoiceNotFoundError:
+            raise
         except Exception as e:
-            print(f"TTS Error in create_synchronized_dubbed_audio: {type(e).__name__}: {str(e)}")
-            print(f"Voice option: {voice_option}")
-            print(f"Audio path exists: {os.path.exists(original_audio_path) if original_audio_path else 'None'}")
-            print(f"Utterances count: {len(transcription_data.get('utterances', []))}")
+            logger.error("TTS Error in create_synchronized_dubbed_audio: %s: %s", type(e).__name__, e)
+            logger.error("Voice ID: %s", voice_id)
+            logger.error("Utterances count: %d", len(transcription_data.get('utterances', [])))
             raise HTTPException(status_code=500, detail=f"Synchronized audio dubbing failed: {str(e)}")
 
     async def _combine_utterances_with_timing(
@@ -535,7 +1147,7 @@ class TTSService:
         """
         import ffmpeg
         
-        print(f"[TTS {session_id}] Combining {len(utterance_files)} utterances with timing...")
+        logger.info("[TTS %s] Combining %d utterances with timing...", session_id, len(utterance_files))
         
         if not utterance_files:
             raise ValueError("No utterance files to combine")
@@ -543,8 +1155,8 @@ class TTSService:
         # Sort utterances by start time
         utterance_files.sort(key=lambda x: x['start'])
         
-        # Create a list of audio segments with proper timing
-        audio_segments = []
+        # Timeline of ("silence", seconds) gaps and ("utterance", path) clips
+        segments = []
         current_time = 0
         
         for i, utterance in enumerate(utterance_files):
@@ -556,120 +1168,177 @@ class TTSService:
             if start_time > current_time and start_time - current_time > 0.1:  # Gap > 100ms
                 gap_duration = start_time - current_time
                 silence_duration = max(0.1, gap_duration)  # At least 100ms silence
-                
-                silence_file = os.path.join(temp_dir, f"gap_{i}.{AUDIO_FORMAT}")
-                try:
-                    (
-                        ffmpeg
-                        .input('anullsrc=channel_layout=mono:sample_rate=44100', f='lavfi', t=silence_duration)
-                        .output(silence_file, acodec="libmp3lame", ar="44100")
-                        .overwrite_output()
-                        .run(quiet=True)
-                    )
-                    audio_segments.append(silence_file)
-                    print(f"[TTS {session_id}] Added {silence_duration:.2f}s silence gap before utterance {i+1}")
-                except Exception as e:
-                    print(f"[TTS {session_id}] Warning: Could not create silence gap: {str(e)}")
+                segments.append(("silence", silence_duration))
+                logger.debug("[TTS %s] Added %.2fs silence gap before utterance %d", session_id, silence_duration, i+1)
             
             # Add the utterance audio
-            audio_segments.append(file_path)
+            segments.append(("utterance", file_path))
             current_time = end_time
             
-            print(f"[TTS {session_id}] Added utterance {i+1}: {start_time:.2f}s-{end_time:.2f}s")
-            print(f"[TTS {session_id}] Audio file: {file_path}")
-            
-            # Verify this is a TTS-generated file, not original audio
-            if 'utterance_' in os.path.basename(file_path):
-                print(f"[TTS {session_id}] ✓ Confirmed TTS-generated utterance file")
-            else:
-                print(f"[TTS {session_id}] ⚠️  WARNING: This doesn't look like a TTS file: {file_path}")
+            logger.debug("[TTS %s] Added utterance %d: %.2fs-%.2fs", session_id, i+1, start_time, end_time)
+            logger.debug("[TTS %s] Audio file: %s", session_id, file_path)
         
-        print(f"[TTS {session_id}] Total audio segments to concatenate: {len(audio_segments)}")
-        for idx, segment in enumerate(audio_segments):
-            print(f"[TTS {session_id}]   {idx+1}. {os.path.basename(segment)} ({'silence' if 'gap_' in segment else 'utterance'})")
+        logger.debug("[TTS %s] Total audio segments to concatenate: %d", session_id, len(segments))
         
         # Create the final output file
-        final_output = os.path.join(temp_dir, f"synchronized_dubbed_audio.{AUDIO_FORMAT}")
-        
-        if len(audio_segments) == 1:
-            # If only one segment, just copy it
-            import shutil
-            shutil.copy2(audio_segments[0], final_output)
-            print(f"[TTS {session_id}] Single audio segment copied: {final_output}")
-        else:
-            # Concatenate all segments
-            try:
-                # Create input streams for each audio segment
-                input_streams = [ffmpeg.input(segment) for segment in audio_segments]
-                
-                # Concatenate all streams
-                (
-                    ffmpeg
-                    .concat(*input_streams, v=0, a=1)
-                    .output(final_output, acodec="libmp3lame", ar="44100")
-                    .overwrite_output()
-                    .run(quiet=True)
-                )
-                print(f"[TTS {session_id}] Successfully concatenated {len(audio_segments)} audio segments")
-                
-            except ffmpeg.Error as e:
-                error_msg = e.stderr.decode() if e.stderr else str(e)
-                print(f"[TTS {session_id}] FFmpeg concatenation error: {error_msg}")
-                raise ValueError(f"Failed to concatenate audio segments: {error_msg}")
-            except Exception as e:
-                print(f"[TTS {session_id}] Error during concatenation: {str(e)}")
-                raise ValueError(f"Failed to concatenate audio segments: {str(e)}")
+        final_output = os.path.join(temp_dir, f"synchronized_dubbed_audio.{DUB_AUDIO_FORMAT}")
+        
+        # Concatenate all segments and encode to AAC in one pass; ffmpeg/ffprobe
+        # run in threads so other sessions keep making progress during the encode
+        try:
+            if len(segments) > 1 and await asyncio.to_thread(self._can_concat_demuxer, utterance_files[0]['file']):
+                try:
+                    await asyncio.to_thread(self._concat_demuxer, segments, temp_dir, final_output)
+                    logger.info("[TTS %s] Joined %d audio segments with the concat demuxer", session_id, len(segments))
+                except ffmpeg.Error as e:
+                    error_msg = e.stderr.decode() if e.stderr else str(e)
+                    logger.warning("[TTS %s] Concat demuxer failed, using the concat filter instead: %s", session_id, error_msg)
+                    await asyncio.to_thread(self._concat_reencode, segments, final_output)
+            else:
+                await asyncio.to_thread(self._concat_reencode, segments, final_output)
+                logger.info("[TTS %s] Encoded %d audio segments", session_id, len(segments))
+            
+        except ffmpeg.Error as e:
+            error_msg = e.stderr.decode() if e.stderr else str(e)
+            logger.error("[TTS %s] FFmpeg concatenation error: %s", session_id, error_msg)
+            raise ValueError(f"Failed to concatenate audio segments: {error_msg}")
+        except Exception as e:
+            logger.error("[TTS %s] Error during concatenation: %s", session_id, e)
+            raise ValueError(f"Failed to concatenate audio segments: {str(e)}")
         
         # Verify the output file was created
-        if not os.path.exists(final_output):
+        if not await asyncio.to_thread(os.path.exists, final_output):
             raise ValueError(f"Output file was not created: {final_output}")
         
         # Check the duration of the final dubbed audio vs expected duration
-        try:
-            import subprocess
-            result = subprocess.run(
-                ['ffprobe', '-v', 'quiet', '-show_entries', 'format=duration', '-of', 'csv=p=0', final_output],
-                capture_output=True, text=True
-            )
-            if result.returncode == 0:
-                actual_duration = float(result.stdout.strip())
+        # (diagnostic only, so production skips the extra ffprobe)
+        if logger.isEnabledFor(logging.DEBUG):
+            try:
+                probe = await asyncio.to_thread(ffmpeg.probe, final_output)
+                actual_duration = float(probe['format']['duration'])
                 expected_duration = utterance_files[-1]['end'] if utterance_files else 0
-                print(f"[TTS {session_id}] Dubbed audio duration: {actual_duration:.2f}s (expected: {expected_duration:.2f}s)")
+                logger.debug("[TTS %s] Dubbed audio duration: %.2fs (expected: %.2fs)", session_id, actual_duration, expected_duration)
                 
                 if actual_duration > expected_duration * 1.5:  # More than 50% longer than expected
-                    print(f"[TTS {session_id}] WARNING: Dubbed audio is significantly longer than expected!")
-                    print(f"[TTS {session_id}] This might indicate the audio contains extra content")
-        except Exception as probe_error:
-            print(f"[TTS {session_id}] Could not probe audio duration: {str(probe_error)}")
+                    logger.warning("[TTS %s] Dubbed audio is significantly longer than expected!", session_id)
+                    logger.warning("[TTS %s] This might indicate the audio contains extra content", session_id)
+            except Exception as probe_error:
+                logger.warning("[TTS %s] Could not probe audio duration: %s", session_id, probe_error)
         
-        print(f"[TTS {session_id}] Audio combination successful: {final_output}")
+        logger.info("[TTS %s] Audio combination successful: %s", session_id, final_output)
         return final_output
+    
+    def _can_concat_demuxer(self, utterance_path: str) -> bool:
+        """Check whether synthesized clips match the silence format, so they can be joined at the packet level"""
+        import ffmpeg
+        
+        try:
+            stream = next(
+                s for s in ffmpeg.probe(utterance_path)['streams'] if s.get('codec_type') == 'audio'
+            )
+        except Exception:
+            return False
+        
+        return (
+            stream.get('codec_name') == 'mp3'
+            and int(stream.get('sample_rate', 0)) == SEGMENT_SAMPLE_RATE
+            and stream.get('channels') == 1
+        )
+    
+    @staticmethod
+    def _audio_output_args(acodec: str) -> Dict[str, str]:
+        """ffmpeg output options for a joined dub track"""
+        if acodec == "copy":
+            return {"c": "copy"}
+        return {"acodec": acodec, "audio_bitrate": SEGMENT_BITRATE}
+    
+    def _concat_demuxer(
+        self,
+        segments: List[tuple],
+        temp_dir: str,
+        final_output: str,
+        acodec: str = DUB_AUDIO_CODEC
+    ):
+        """Join MP3 segments with the concat demuxer, then encode once to acodec ("copy" skips encoding)"""
+        import ffmpeg
+        
+        # Encode every silence gap in one ffmpeg process with one output per gap
+        gap_outputs = []
+        list_entries = []
+        for index, (kind, value) in enumerate(segments):
+            if kind == "silence":
+                gap_path = os.path.join(temp_dir, f"gap_{index}.{AUDIO_FORMAT}")
+                gap_outputs.append(
+                    ffmpeg
+                    .input(f'anullsrc=channel_layout=mono:sample_rate={SEGMENT_SAMPLE_RATE}', f='lavfi', t=value)
+                    .output(gap_path, acodec="libmp3lame", ar=SEGMENT_SAMPLE_RATE, ac=1, audio_bitrate=SEGMENT_BITRATE)
+                )
+                list_entries.append(gap_path)
+            else:
+                list_entries.append(value)
+        
+        if gap_outputs:
+            ffmpeg.merge_outputs(*gap_outputs).overwrite_output().run(quiet=True)
+        
+        concat_list = os.path.join(temp_dir, "concat.txt")
+        with open(concat_list, 'w') as f:
+            for path in list_entries:
+                escaped = path.replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        
+        (
+            ffmpeg
+            .input(concat_list, f='concat', safe=0)
+            .output(final_output, **self._audio_output_args(acodec))
+            .overwrite_output()
+            .run(quiet=True)
+        )
+    
+    def _concat_reencode(self, segments: List[tuple], final_output: str, acodec: str = DUB_AUDIO_CODEC):
+        """Concatenate segments through the concat filter, generating silence in-graph"""
+        import ffmpeg
+        
+        input_streams = [
+            ffmpeg.input(f'anullsrc=channel_layout=mono:sample_rate={SEGMENT_SAMPLE_RATE}', f='lavfi', t=value)
+            if kind == "silence" else ffmpeg.input(value)
+            for kind, value in segments
+        ]
+        (
+            ffmpeg
+            .concat(*input_streams, v=0, a=1)
+            .output(final_output, ar=str(SEGMENT_SAMPLE_RATE), **self._audio_output_args(acodec))
+            .overwrite_output()
+            .run(quiet=True)
+        )
 
-
-# Voice settings presets
-VOICE_PRESETS = {
-    "natural": {
+# Voice settings presets (read-only, since they are shared by every session)
+VOICE_PRESETS = MappingProxyType({
+    "natural": MappingProxyType({
         "stability": 0.5,
         "similarity_boost": 0.8,
         "style": 0.0,
         "use_speaker_boost": True
-    },
-    "dramatic": {
+    }),
+    "dramatic": MappingProxyType({
         "stability": 0.3,
         "similarity_boost": 0.9,
         "style": 0.2,
         "use_speaker_boost": True
-    },
-    "calm": {
+    }),
+    "calm": MappingProxyType({
         "stability": 0.8,
         "similarity_boost": 0.6,
         "style": 0.0,
         "use_speaker_boost": False
-    },
-    "energetic": {
+    }),
+    "energetic": MappingProxyType({
         "stability": 0.2,
         "similarity_boost": 0.9,
         "style": 0.3,
         "use_speaker_boost": True
-    }
-} 
+    })
+})
+
+
+# Global TTS service instance
+tts_service = TTSService()
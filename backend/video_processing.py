@@ -1,14 +1,47 @@
+import logging
 import os
 import tempfile
 import shutil
+import sqlite3
 import asyncio
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
-import ffmpeg
 from fastapi import HTTPException
 
 from config import config
+from logger import get_logger
+
+
+logger = get_logger("video_processing")
+
+
+# Constants
+CLONE_REFERENCE_SECONDS = 60.0  # ElevenLabs clones well from a minute of speech
+# Strip rumble and hiss outside the voice band, then even out loudness
+CLONE_REFERENCE_FILTER = "highpass=f=80,lowpass=f=8000,loudnorm"
+FFMPEG_ERROR_TAIL_BYTES = 8192  # End of the ffmpeg log surfaced when a command fails
+SESSION_DB_TIMEOUT = 5.0  # Seconds to wait on another worker's write lock before failing
+
+# Direct FFmpeg command for explicit audio replacement; every job has the same
+# shape, so the argv is fixed here and only the {placeholders} are filled in
+MUX_COMMAND = (
+    'ffmpeg',
+    '-i', '{video}',             # Input 0: original video (has both video and audio)
+    '-i', '{audio}',             # Input 1: dubbed audio only
+    '-map', '0:v:0',             # Map video stream 0 from input 0 (original video)
+    '-map', '1:a:0',             # Map audio stream 0 from input 1 (dubbed audio)
+    '-c:v', 'copy',              # Copy video codec (no re-encoding)
+    '-c:a', '{acodec}',          # Copy AAC dub, or encode other formats to AAC
+    '-shortest',                 # Use shortest stream duration
+    '-threads', '0',             # Let ffmpeg use every core when the audio must be encoded
+    '-movflags', '+faststart',   # Put the moov atom first so playback starts before download ends
+    '-y',                        # Overwrite output file
+    '{out}'
+)
 
 
 class VideoProcessor:
@@ -18,10 +51,10 @@ class VideoProcessor:
         if session_id:
             self.temp_dir = config.get_temp_dir(session_id)
             os.makedirs(self.temp_dir, exist_ok=True)
-            print(f"[VIDEO_PROCESSOR {session_id}] Using temp dir: {self.temp_dir}")
+            logger.info("[VIDEO_PROCESSOR %s] Using temp dir: %s", session_id, self.temp_dir)
         else:
             self.temp_dir = tempfile.mkdtemp()
-            print(f"[VIDEO_PROCESSOR] Using temp dir: {self.temp_dir}")
+            logger.info("[VIDEO_PROCESSOR] Using temp dir: %s", self.temp_dir)
     
     async def combine_video_with_dubbed_audio(
         self,
@@ -41,72 +74,119 @@ class VideoProcessor:
             Path to final dubbed video file
         """
         try:
-            print(f"[VIDEO_PROCESSOR] Starting video/audio combination...")
-            print(f"[VIDEO_PROCESSOR] Original video: {original_video_path}")
-            print(f"[VIDEO_PROCESSOR] Dubbed audio: {dubbed_audio_path}")
-            print(f"[VIDEO_PROCESSOR] Video exists: {os.path.exists(original_video_path)}")
-            print(f"[VIDEO_PROCESSOR] Audio exists: {os.path.exists(dubbed_audio_path)}")
+            logger.info("[VIDEO_PROCESSOR] Starting video/audio combination...")
+            logger.debug("[VIDEO_PROCESSOR] Original video: %s", original_video_path)
+            logger.debug("[VIDEO_PROCESSOR] Dubbed audio: %s", dubbed_audio_path)
             
-            if os.path.exists(dubbed_audio_path):
-                audio_size = os.path.getsize(dubbed_audio_path)
-                print(f"[VIDEO_PROCESSOR] Dubbed audio file size: {audio_size} bytes")
+            # Diagnostic stat calls only when debug logging is on
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("[VIDEO_PROCESSOR] Video exists: %s", os.path.exists(original_video_path))
+                try:
+                    audio_size = os.stat(dubbed_audio_path).st_size
+                    logger.debug("[VIDEO_PROCESSOR] Dubbed audio file size: %d bytes", audio_size)
+                except FileNotFoundError:
+                    logger.debug("[VIDEO_PROCESSOR] Dubbed audio does not exist")
             
             output_path = os.path.join(self.temp_dir, "dubbed_video.mp4")
-            print(f"[VIDEO_PROCESSOR] Output path: {output_path}")
+            logger.debug("[VIDEO_PROCESSOR] Output path: %s", output_path)
             
             # Get video duration from transcription data or video file
             duration = transcription_data.get("duration", None)
-            print(f"[VIDEO_PROCESSOR] Duration from transcription: {duration}")
+            logger.debug("[VIDEO_PROCESSOR] Duration from transcription: %s", duration)
             
-            # Use FFmpeg to replace original audio with dubbed audio ONLY
-            print(f"[VIDEO_PROCESSOR] FFmpeg inputs created - video and audio streams")
-            
-            # Direct FFmpeg command approach for explicit audio replacement
-            cmd = [
-                'ffmpeg', 
-                '-i', original_video_path,  # Input 0: original video (has both video and audio)
-                '-i', dubbed_audio_path,    # Input 1: dubbed audio only
-                '-map', '0:v:0',           # Map video stream 0 from input 0 (original video)
-                '-map', '1:a:0',           # Map audio stream 0 from input 1 (dubbed audio)
-                '-c:v', 'copy',            # Copy video codec (no re-encoding)
-                '-c:a', 'aac',             # Encode audio to AAC
-                '-shortest',               # Use shortest stream duration
-                '-y',                      # Overwrite output file
-                output_path
-            ]
-            
-            print(f"[VIDEO_PROCESSOR] FFmpeg command: {' '.join(cmd)}")
-            print(f"[VIDEO_PROCESSOR] ✓ Explicitly mapping video from original, audio from dubbed file only")
+            # The timed dub arrives already encoded as AAC, so the mux is a pure
+            # stream copy; other dub tracks (MP3) are still encoded here
+            audio_codec = 'copy' if dubbed_audio_path.endswith('.m4a') else 'aac'
             
-            # Run command
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
+            # Use FFmpeg to replace original audio with dubbed audio ONLY
+            # (whole-argument substitution, so braces in paths are left alone)
+            substitutions = {
+                "{video}": original_video_path,
+                "{audio}": dubbed_audio_path,
+                "{acodec}": audio_codec,
+                "{out}": output_path
+            }
+            cmd = [substitutions.get(arg, arg) for arg in MUX_COMMAND]
             
-            stdout, stderr = await process.communicate()
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("[VIDEO_PROCESSOR] FFmpeg command: %s", ' '.join(cmd))
             
-            if process.returncode != 0:
-                error_msg = stderr.decode() if stderr else "Unknown FFmpeg error"
-                print(f"FFmpeg error (return code {process.returncode}): {error_msg}")
-                raise HTTPException(status_code=500, detail=f"FFmpeg failed: {error_msg}")
+            # Run command
+            await self._exec_ffmpeg(cmd, "ffmpeg_mux.log")
             
             if not os.path.exists(output_path):
                 raise HTTPException(status_code=500, detail="Video processing failed - output file not created")
             
-            print(f"Video combination successful: {output_path}")
+            logger.info("[VIDEO_PROCESSOR] Video combination successful: %s", output_path)
             return output_path
             
         except Exception as e:
-            print(f"[VIDEO_PROCESSOR] Error in combine_video_with_dubbed_audio: {type(e).__name__}: {str(e)}")
+            logger.exception("[VIDEO_PROCESSOR] Error in combine_video_with_dubbed_audio")
             raise HTTPException(status_code=500, detail=f"Video processing failed: {str(e)}")
     
+    @staticmethod
+    def _audio_extraction(video_path: str, target: str, start_time: float, duration: Optional[float], **output_kwargs):
+        """Build the ffmpeg graph that extracts filtered mono 22kHz PCM audio for voice cloning"""
+        import ffmpeg
+        
+        input_video = ffmpeg.input(video_path, ss=start_time)
+        
+        if duration:
+            input_video = ffmpeg.input(video_path, ss=start_time, t=duration)
+        
+        # Extract, filter and downsample in one pass; WAV for better quality
+        return ffmpeg.output(
+            input_video['a'],
+            target,
+            af=CLONE_REFERENCE_FILTER,
+            acodec='pcm_s16le',  # Uncompressed audio for voice cloning
+            ar=22050,            # 22kHz sample rate (good for voice cloning)
+            ac=1,                # Mono audio
+            **output_kwargs
+        )
+    
+    async def _exec_ffmpeg(self, cmd: List[str], log_name: str, capture_stdout: bool = False) -> bytes:
+        """
+        Run an ffmpeg command to completion
+        
+        stderr goes to a log file in the session temp dir instead of memory, and only
+        its tail is read back (into the raised error) when ffmpeg fails.
+        
+        Returns:
+            ffmpeg's stdout when capture_stdout is set, otherwise b""
+        """
+        log_path = os.path.join(self.temp_dir, log_name)
+        with open(log_path, 'wb') as stderr_log:
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE if capture_stdout else asyncio.subprocess.DEVNULL,
+                stderr=stderr_log
+            )
+            stdout, _ = await process.communicate()
+        
+        if process.returncode != 0:
+            error_msg = await asyncio.to_thread(_read_tail, log_path, FFMPEG_ERROR_TAIL_BYTES) or "Unknown FFmpeg error"
+            logger.error("[VIDEO_PROCESSOR] FFmpeg error (return code %d): %s", process.returncode, error_msg)
+            raise RuntimeError(f"FFmpeg exited with code {process.returncode}: {error_msg}")
+        
+        return stdout or b""
+    
+    async def _run_ffmpeg(self, output, log_name: str, capture_stdout: bool = False) -> bytes:
+        """Run an ffmpeg-python graph through _exec_ffmpeg"""
+        import ffmpeg
+        
+        # Compile the graph once and reuse the argv for logging and exec
+        cmd = ffmpeg.compile(output)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[VIDEO_PROCESSOR] FFmpeg command: %s", ' '.join(cmd))
+        
+        return await self._exec_ffmpeg(cmd, log_name, capture_stdout)
+    
     async def extract_audio_segment(
         self,
         video_path: str,
         start_time: float = 0,
-        duration: Optional[float] = None
+        duration: Optional[float] = CLONE_REFERENCE_SECONDS
     ) -> str:
         """
         Extract audio segment from video for voice cloning
@@ -122,84 +202,236 @@ class VideoProcessor:
         try:
             audio_output_path = os.path.join(self.temp_dir, "extracted_audio.wav")
             
-            input_video = ffmpeg.input(video_path, ss=start_time)
+            await self._run_ffmpeg(
+                self._audio_extraction(video_path, audio_output_path, start_time, duration, y=True),
+                "ffmpeg_extract.log"
+            )
+            
+            if not os.path.exists(audio_output_path):
+                raise HTTPException(status_code=500, detail="Audio extraction failed")
             
-            if duration:
-                input_video = ffmpeg.input(video_path, ss=start_time, t=duration)
+            return audio_output_path
             
-            # Extract audio as WAV for better quality
-            output = ffmpeg.output(
-                input_video['a'],
-                audio_output_path,
-                acodec='pcm_s16le',  # Uncompressed audio for voice cloning
-                ar=22050,            # 22kHz sample rate (good for voice cloning)
-                ac=1,                # Mono audio
-                y=True
-            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Audio extraction failed: {str(e)}")
+    
+    async def extract_audio_bytes(
+        self,
+        video_path: str,
+        start_time: float = 0,
+        duration: Optional[float] = CLONE_REFERENCE_SECONDS
+    ) -> bytes:
+        """
+        Extract audio from video as in-memory WAV, piped from ffmpeg without a temp file
+        
+        The result can go straight to ElevenLabsTTS.clone_voice_from_audio_bytes.
+        
+        Args:
+            video_path: Path to video file
+            start_time: Start time in seconds
+            duration: Duration in seconds (None for entire video)
             
-            # Run FFmpeg command
-            await asyncio.create_subprocess_exec(
-                *ffmpeg.compile(output),
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
+        Returns:
+            WAV file bytes
+        """
+        try:
+            audio_data = await self._run_ffmpeg(
+                self._audio_extraction(video_path, 'pipe:1', start_time, duration, format='wav'),
+                "ffmpeg_extract.log",
+                capture_stdout=True
             )
             
-            if not os.path.exists(audio_output_path):
+            if not audio_data:
                 raise HTTPException(status_code=500, detail="Audio extraction failed")
             
-            return audio_output_path
+            return audio_data
             
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Audio extraction failed: {str(e)}")
     
-    def cleanup(self):
-        """Clean up temporary files"""
-        if os.path.exists(self.temp_dir):
-            shutil.rmtree(self.temp_dir, ignore_errors=True)
+    async def cleanup(self):
+        """Clean up temporary files (in a worker thread, since video files can be large)"""
+        await asyncio.to_thread(shutil.rmtree, self.temp_dir, ignore_errors=True)
 
 
 class DubbingPipeline:
-    """Complete video dubbing pipeline"""
+    """
+    Complete video dubbing pipeline
+    
+    Session state is kept in SQLite (WAL mode) rather than process memory, so
+    status polls work no matter which uvicorn worker they land on. Queries run
+    in worker threads, one at a time on the shared connection, so waiting on
+    another worker's write lock never blocks the event loop.
+    """
+    
+    # Columns callers may set through update_session
+    SESSION_FIELDS = ("status", "progress", "error", "original_video_path", "dubbed_video_path")
+    
+    def __init__(self, db_path: str = None, max_sessions: int = None):
+        self.db_path = db_path or config.SESSION_DB_PATH
+        self.max_sessions = max_sessions or config.SESSION_MAX_ROWS
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        
+        self._conn = sqlite3.connect(
+            self.db_path, timeout=SESSION_DB_TIMEOUT, isolation_level=None, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                progress INTEGER NOT NULL,
+                error TEXT,
+                original_video_path TEXT,
+                dubbed_video_path TEXT,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        # Lets cleanup_old_sessions range-scan only the expired rows
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_sessions_created_at ON sessions (created_at)"
+        )
     
-    def __init__(self):
-        self.sessions: Dict[str, Dict[str, Any]] = {}
+    @contextmanager
+    def _transaction(self):
+        """Hold the connection for one write transaction, rolled back on error"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
     
     async def create_session(self, session_id: str) -> Dict[str, Any]:
         """Create new dubbing session"""
-        self.sessions[session_id] = {
-            "status": "created",
-            "progress": 0,
-            "original_video_path": None,
-            "dubbed_video_path": None,
-            "created_at": asyncio.get_event_loop().time()
-        }
-        return self.sessions[session_id]
-    
-    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        session_data, evicted = await asyncio.to_thread(self._insert_session, session_id)
+        if evicted:
+            logger.info("[SESSIONS] Evicted %d sessions over the %d-session cap", len(evicted), self.max_sessions)
+            await self._remove_session_files(evicted)
+        return session_data
+    
+    def _insert_session(self, session_id: str) -> tuple[Dict[str, Any], List[sqlite3.Row]]:
+        """
+        Insert a session and drop the oldest beyond max_sessions, so the table
+        can't grow unbounded
+        
+        Returns:
+            Tuple of (new session data, evicted session rows)
+        """
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO sessions (session_id, status, progress, created_at) VALUES (?, ?, ?, ?)",
+                (session_id, "created", 0, time.time())
+            )
+            evicted = conn.execute(
+                "SELECT * FROM sessions ORDER BY created_at DESC LIMIT -1 OFFSET ?", (self.max_sessions,)
+            ).fetchall()
+            conn.executemany(
+                "DELETE FROM sessions WHERE session_id = ?",
+                [(session_data["session_id"],) for session_data in evicted]
+            )
+            row = conn.execute(
+                "SELECT * FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return dict(row), evicted
+    
+    async def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get session data"""
-        return self.sessions.get(session_id)
+        return await asyncio.to_thread(self._get_session, session_id)
     
-    def cleanup_old_sessions(self, max_age_hours: int = 24):
-        """Clean up sessions older than max_age_hours"""
-        current_time = asyncio.get_event_loop().time()
-        cutoff_time = current_time - (max_age_hours * 3600)
+    def _get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return dict(row) if row else None
+    
+    async def update_session(self, session_id: str, **fields: Any):
+        """Update session fields (status, progress, error, video paths)"""
+        unknown = set(fields) - set(self.SESSION_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown session fields: {', '.join(sorted(unknown))}")
+        if not fields:
+            return
         
-        expired_sessions = [
-            session_id for session_id, data in self.sessions.items()
-            if data.get("created_at", 0) < cutoff_time
-        ]
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        await asyncio.to_thread(
+            self._execute,
+            f"UPDATE sessions SET {assignments} WHERE session_id = ?",
+            (*fields.values(), session_id)
+        )
+    
+    def _execute(self, sql: str, parameters: tuple):
+        with self._lock:
+            self._conn.execute(sql, parameters)
+    
+    async def cleanup_old_sessions(self, max_age_hours: int = 24):
+        """Clean up sessions older than max_age_hours, deleting their videos off the event loop"""
+        cutoff_time = time.time() - (max_age_hours * 3600)
+        expired_sessions = await asyncio.to_thread(self._delete_expired, cutoff_time)
+        await self._remove_session_files(expired_sessions)
+    
+    def _delete_expired(self, cutoff_time: float) -> List[sqlite3.Row]:
+        """Delete sessions created before cutoff_time, returning their rows"""
+        with self._transaction() as conn:
+            expired_sessions = conn.execute(
+                "SELECT * FROM sessions WHERE created_at < ?", (cutoff_time,)
+            ).fetchall()
+            conn.execute("DELETE FROM sessions WHERE created_at < ?", (cutoff_time,))
+        return expired_sessions
+    
+    @staticmethod
+    async def _remove_session_files(sessions: List[sqlite3.Row]):
+        """
+        Delete the files of removed sessions in a worker thread
         
-        for session_id in expired_sessions:
-            session_data = self.sessions.pop(session_id, {})
-            # Clean up video files
-            for path_key in ["original_video_path", "dubbed_video_path"]:
-                path = session_data.get(path_key)
-                if path and os.path.exists(path):
-                    try:
-                        os.remove(path)
-                    except:
-                        pass
+        Removes each session's whole temp dir (source video, transcription audio,
+        utterance clips, dub track and video), plus any recorded video path
+        that lives outside it.
+        """
+        paths = [
+            config.get_temp_dir(session_data["session_id"])
+            for session_data in sessions
+            if session_data["session_id"]
+        ]
+        paths += [
+            session_data[path_key]
+            for session_data in sessions
+            for path_key in ("original_video_path", "dubbed_video_path")
+            if session_data[path_key]
+        ]
+        if paths:
+            await asyncio.to_thread(_remove_paths, paths)
+
+
+def _read_tail(path: str, size: int) -> str:
+    """Read the last size bytes of a text file, e.g. an ffmpeg log"""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(max(os.path.getsize(path) - size, 0))
+            return f.read().decode(errors="replace").strip()
+    except OSError:
+        return ""
+
+
+def _remove_paths(paths: List[str]):
+    """Delete files and directory trees, ignoring ones that are already gone"""
+    for path in paths:
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            pass
 
 
 # Global dubbing pipeline instance
-dubbing_pipeline = DubbingPipeline() 
+dubbing_pipeline = DubbingPipeline()